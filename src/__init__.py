@@ -2,3 +2,4 @@
 
 from .link_parser import extract_product_id  # noqa: F401
 from .pipeline import run_pipeline  # noqa: F401
+from .scheduler import PipelineScheduler  # noqa: F401
@@ -38,6 +38,13 @@ class Response:
     def json(self):
         return json.loads(self.content.decode("utf-8"))
 
+    def iter_content(self, chunk_size: int = 1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start : start + chunk_size]
+
+    def close(self) -> None:
+        return None
+
 
 class Session:
     def __init__(self) -> None:
@@ -7,6 +7,9 @@ import logging
 from pathlib import Path
 from typing import Iterable, List
 
+from .profiling import profiled
+from .storage import DEFAULT_STORAGE, Storage
+
 try:  # pragma: no cover - exercised through tests with monkeypatching
     from rembg import remove
 except ImportError:  # pragma: no cover
@@ -15,34 +18,66 @@ except ImportError:  # pragma: no cover
 LOGGER = logging.getLogger(__name__)
 
 
-def remove_background(image_path: Path, output_path: Path) -> Path:
+@profiled("remove_background")
+def remove_background(
+    image_path: Path, output_path: Path, storage: Storage = DEFAULT_STORAGE
+) -> Path:
     """Remove background for a single image keeping PNG format."""
 
     if remove is None:  # pragma: no cover - environment without rembg
         raise ImportError("rembg is required for background removal")
 
-    raw_bytes = image_path.read_bytes()
+    raw_bytes = storage.read(image_path.as_posix())
+    if isinstance(raw_bytes, memoryview):
+        raw_bytes = bytes(raw_bytes)
     result = remove(raw_bytes)
     try:
         from PIL import Image  # type: ignore
     except ImportError:  # pragma: no cover - fallback when pillow missing
-        output_path.write_bytes(result)
+        storage.write(output_path.as_posix(), [result])
         return output_path
 
+    buffer = io.BytesIO()
     with Image.open(io.BytesIO(result)) as image:
-        image.save(output_path, format="PNG")
+        image.save(buffer, format="PNG")
+    storage.write(output_path.as_posix(), [buffer.getbuffer()])
     return output_path
 
 
-def process_batch(paths: Iterable[Path], output_dir: Path) -> List[Path]:
-    """Process a batch of images and return the paths of successful outputs."""
+def output_path_for(image_path: Path, output_dir: Path) -> Path:
+    """Return where :func:`process_batch` stores the result for ``image_path``."""
+
+    return output_dir / f"{image_path.stem}_transparent.png"
+
+
+def _is_up_to_date(storage: Storage, source: Path, output: Path) -> bool:
+    source_stat = storage.stat(source.as_posix())
+    output_stat = storage.stat(output.as_posix())
+    if source_stat is None or output_stat is None:
+        return False
+    return output_stat.modified >= source_stat.modified
+
+
+def process_batch(
+    paths: Iterable[Path], output_dir: Path, storage: Storage = DEFAULT_STORAGE
+) -> List[Path]:
+    """Process a batch of images and return the paths of successful outputs.
+
+    Outputs newer than their source image are reused, so images left untouched
+    by a conditional re-download are not matted again. ``paths`` are keys in
+    ``storage``, as returned by :func:`src.image_downloader.download_images`.
+    """
 
-    output_dir.mkdir(parents=True, exist_ok=True)
+    storage.makedirs(output_dir.as_posix())
     processed: List[Path] = []
     for path in paths:
         try:
-            output_path = output_dir / f"{path.stem}_transparent.png"
-            remove_background(path, output_path)
+            output_path = output_path_for(path, output_dir)
+            if _is_up_to_date(storage, path, output_path):
+                LOGGER.debug("Reusing up-to-date output %s", output_path)
+                processed.append(output_path)
+                continue
+            remove_background(path, output_path, storage)
             processed.append(output_path)
         except Exception as exc:  # pragma: no cover - logging path
             LOGGER.error("Failed to process %s: %s", path, exc)
@@ -9,13 +9,30 @@ from pathlib import Path
 from typing import List
 
 from .pipeline import run_pipeline
+from .scheduler import (
+    DEFAULT_TENANT,
+    PRIORITY_BULK,
+    PRIORITY_CLASSES,
+    PipelineScheduler,
+)
+from .storage import (
+    DEFAULT_STORAGE,
+    ObjectStoreStorage,
+    PackedArchiveStorage,
+    Storage,
+)
 
 LOGGER = logging.getLogger(__name__)
 
 
 def _parse_arguments(argv: List[str] | None = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Douyin product image pipeline")
-    parser.add_argument("--input", required=True, help="Raw share link or text")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", help="Raw share link or text")
+    source.add_argument(
+        "--batch",
+        help="File with one share link or text per line, processed concurrently",
+    )
     parser.add_argument(
         "--output",
         default="output",
@@ -27,31 +44,98 @@ def _parse_arguments(argv: List[str] | None = None) -> argparse.Namespace:
         type=int,
         help="Indices of images to display (1-based). Defaults to all.",
     )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Write CPU, memory and per-stage timing profiles next to the output",
+    )
+    parser.add_argument(
+        "--storage",
+        choices=("local", "packed", "object"),
+        default="local",
+        help=(
+            "Where to write images: one file per image (local), a single packed "
+            "archive in the output directory (packed) or a local S3-style "
+            "object store (object)"
+        ),
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Number of concurrent pipeline workers in batch mode",
+    )
+    parser.add_argument(
+        "--priority",
+        choices=PRIORITY_CLASSES,
+        default=PRIORITY_BULK,
+        help="Priority class for batch jobs",
+    )
+    parser.add_argument(
+        "--tenant", default=DEFAULT_TENANT, help="Tenant name for fair sharing"
+    )
     return parser.parse_args(argv)
 
 
+def _summarise(result, select: List[int] | None) -> dict:
+    processed = result["processed_images"]
+    indices = select or list(range(1, len(processed) + 1))
+    selected = [processed[i - 1] for i in indices if 0 < i <= len(processed)]
+    return {
+        "product_id": result["product_id"],
+        "processed_images": [str(path) for path in selected],
+    }
+
+
+def _create_storage(kind: str, output_dir: Path) -> Storage:
+    if kind == "packed":
+        return PackedArchiveStorage(output_dir / "pipeline.pack")
+    if kind == "object":
+        return ObjectStoreStorage(output_dir / "object-store")
+    return DEFAULT_STORAGE
+
+
+def _run_batch(args: argparse.Namespace, output_dir: Path, storage: Storage) -> int:
+    lines = Path(args.batch).read_text(encoding="utf-8").splitlines()
+    inputs = [line.strip() for line in lines if line.strip()]
+    # A batch only ever submits one class, so it may use every worker; the
+    # default bulk quota reserves a slot for interactive work that never comes.
+    quotas = {args.priority: args.workers}
+    with PipelineScheduler(
+        workers=args.workers, quotas=quotas, runner=run_pipeline
+    ) as scheduler:
+        futures = [
+            scheduler.submit(
+                raw_text,
+                output_dir,
+                priority=args.priority,
+                tenant=args.tenant,
+                profile=args.profile,
+                storage=storage,
+            )
+            for raw_text in inputs
+        ]
+        summaries = []
+        for raw_text, future in zip(inputs, futures):
+            try:
+                summaries.append(_summarise(future.result(), args.select))
+            except Exception as exc:
+                LOGGER.error("Failed to process %s: %s", raw_text[:200], exc)
+                summaries.append({"input": raw_text, "error": str(exc)})
+
+    print(json.dumps(summaries, ensure_ascii=False, indent=2))
+    return 1 if any("error" in summary for summary in summaries) else 0
+
+
 def main(argv: List[str] | None = None) -> int:
     args = _parse_arguments(argv)
     output_dir = Path(args.output)
-    result = run_pipeline(args.input, output_dir)
-
-    indices = args.select or list(range(1, len(result["processed_images"]) + 1))
-    selected = [
-        result["processed_images"][i - 1]
-        for i in indices
-        if 0 < i <= len(result["processed_images"])
-    ]
-
-    print(
-        json.dumps(
-            {
-                "product_id": result["product_id"],
-                "processed_images": [str(path) for path in selected],
-            },
-            ensure_ascii=False,
-            indent=2,
-        )
-    )
+    storage = _create_storage(args.storage, output_dir)
+    if args.batch:
+        return _run_batch(args, output_dir, storage)
+
+    result = run_pipeline(args.input, output_dir, profile=args.profile, storage=storage)
+    print(json.dumps(_summarise(result, args.select), ensure_ascii=False, indent=2))
     return 0
 
 
@@ -4,7 +4,7 @@ from __future__ import annotations
 
 import logging
 from dataclasses import dataclass, field
-from typing import Dict, List
+from typing import List
 from urllib.parse import urlencode, urlparse, urlunparse, parse_qsl
 
 try:  # pragma: no cover - fallback when requests is unavailable
@@ -12,6 +12,9 @@ try:  # pragma: no cover - fallback when requests is unavailable
 except ImportError:  # pragma: no cover
     from . import _requests_compat as requests
 
+from .profiling import profiled
+from .records import ProductDetail
+
 LOGGER = logging.getLogger(__name__)
 
 _DEFAULT_HEADERS = {
@@ -44,7 +47,8 @@ class DouyinClient:
         self.session.headers.setdefault("Cookie", "")
         self.session.headers.update(_DEFAULT_HEADERS)
 
-    def fetch_product_detail(self, product_id: str) -> Dict:
+    @profiled("fetch_product_detail")
+    def fetch_product_detail(self, product_id: str) -> ProductDetail:
         """Fetch product detail structure.
 
         The implementation targets the public H5 endpoint used inside the Douyin
@@ -105,8 +109,4 @@ class DouyinClient:
         if not images:
             raise ValueError(f"Product {product_id} does not have image data")
 
-        return {
-            "product_id": product_id,
-            "title": title,
-            "images": images,
-        }
+        return ProductDetail(product_id=product_id, title=title, images=tuple(images))
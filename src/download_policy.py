@@ -0,0 +1,436 @@
+"""Latency-aware request policies for image downloads.
+
+CDN edges serving product images are occasionally slow or flaky. The helpers
+in this module wrap a regular session so that every ``get``/``fetch`` call:
+
+* tracks per-host latency and hedges a duplicate request once the primary has
+  been outstanding longer than the host's recent p95 latency,
+* short-circuits hosts that keep failing (circuit breaker),
+* retries transient failures with exponential backoff, bounded by a shared
+  retry budget so retries never multiply the load on an unhealthy CDN.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import functools
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from .profiling import profiled_call
+
+try:  # pragma: no cover - fallback when requests is unavailable
+    import requests
+except ImportError:  # pragma: no cover
+    from . import _requests_compat as requests
+
+LOGGER = logging.getLogger(__name__)
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised when a host is short-circuited after repeated failures."""
+
+
+class LatencyTracker:
+    """Keep a rolling window of successful response latencies per host."""
+
+    def __init__(self, window: int = 200) -> None:
+        self._window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, host: str, seconds: float) -> None:
+        with self._lock:
+            samples = self._samples.get(host)
+            if samples is None:
+                samples = self._samples[host] = deque(maxlen=self._window)
+            samples.append(seconds)
+
+    def count(self, host: str) -> int:
+        with self._lock:
+            return len(self._samples.get(host, ()))
+
+    def percentile(self, host: str, quantile: float) -> Optional[float]:
+        """Return the nearest-rank ``quantile`` latency for ``host``."""
+
+        with self._lock:
+            samples = sorted(self._samples.get(host, ()))
+        if not samples:
+            return None
+        rank = int(round(quantile * len(samples))) - 1
+        return samples[min(len(samples) - 1, max(0, rank))]
+
+
+class CircuitBreaker:
+    """Per-host circuit breaker with a half-open probe after ``reset_timeout``."""
+
+    def __init__(
+        self, failure_threshold: int = 5, reset_timeout: float = 30.0
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures: Dict[str, int] = {}
+        self._opened_at: Dict[str, float] = {}
+        self._probing: Dict[str, bool] = {}
+        self._lock = threading.Lock()
+
+    def allow(self, host: str) -> bool:
+        with self._lock:
+            opened_at = self._opened_at.get(host)
+            if opened_at is None:
+                return True
+            if time.monotonic() - opened_at < self.reset_timeout:
+                return False
+            # half-open: let a single probe through until it reports back
+            if self._probing.get(host):
+                return False
+            self._probing[host] = True
+            return True
+
+    def release_probe(self, host: str) -> None:
+        """Let another probe through after one ended without a verdict."""
+
+        with self._lock:
+            self._probing.pop(host, None)
+
+    def record_success(self, host: str) -> None:
+        with self._lock:
+            self._failures.pop(host, None)
+            self._opened_at.pop(host, None)
+            self._probing.pop(host, None)
+
+    def record_failure(self, host: str) -> None:
+        with self._lock:
+            failures = self._failures.get(host, 0) + 1
+            self._failures[host] = failures
+            if self._probing.pop(host, False) or failures >= self.failure_threshold:
+                if host not in self._opened_at:
+                    LOGGER.warning(
+                        "Opening circuit for %s after %d failures", host, failures
+                    )
+                self._opened_at[host] = time.monotonic()
+
+    def is_open(self, host: str) -> bool:
+        with self._lock:
+            return host in self._opened_at
+
+
+class RetryBudget:
+    """Token bucket capping extra requests (retries and hedges).
+
+    The bucket starts with ``min_retries`` tokens, every primary request
+    deposits ``ratio`` tokens and each extra attempt spends one. Tokens never
+    exceed ``max_tokens``, so a long healthy period cannot bank enough credit
+    to turn an outage into a retry storm.
+    """
+
+    def __init__(
+        self, ratio: float = 0.2, min_retries: int = 3, max_tokens: float = 10.0
+    ) -> None:
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.max_tokens = max(max_tokens, float(min_retries))
+        self._tokens = float(min_retries)
+        self._lock = threading.Lock()
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            return self._tokens
+
+    def record_request(self) -> None:
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+@dataclass
+class DownloadPolicy:
+    """Tunables and shared state for latency-aware downloads.
+
+    A policy is meant to be long lived: latency history, circuit state and the
+    retry budget are shared by every session created from it.
+    """
+
+    backoff_factor: float = 0.5
+    status_forcelist: Tuple[int, ...] = (500, 502, 503, 504)
+    hedge_quantile: float = 0.95
+    hedge_min_samples: int = 10
+    hedge_default_delay: Optional[float] = 1.0
+    hedge_min_delay: float = 0.05
+    failure_threshold: int = 5
+    reset_timeout: float = 30.0
+    retry_ratio: float = 0.2
+    min_retries: int = 3
+    max_retry_tokens: float = 10.0
+    latency: LatencyTracker = field(init=False)
+    breaker: CircuitBreaker = field(init=False)
+    budget: RetryBudget = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.latency = LatencyTracker()
+        self.breaker = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        self.budget = RetryBudget(
+            self.retry_ratio, self.min_retries, self.max_retry_tokens
+        )
+
+    def hedge_delay(self, host: str, timeout: Optional[float]) -> Optional[float]:
+        """Return how long to wait before hedging, or ``None`` to never hedge."""
+
+        if self.latency.count(host) >= self.hedge_min_samples:
+            delay = self.latency.percentile(host, self.hedge_quantile)
+        else:
+            delay = self.hedge_default_delay
+        if delay is None:
+            return None
+        delay = max(delay, self.hedge_min_delay)
+        if timeout is not None and delay >= timeout:
+            return None
+        return delay
+
+    def backoff(self, attempt: int) -> float:
+        return self.backoff_factor * (2 ** attempt)
+
+
+class AdaptiveSession:
+    """Session wrapper applying a :class:`DownloadPolicy` to ``get``/``fetch`` calls."""
+
+    def __init__(
+        self,
+        session: requests.Session,
+        policy: DownloadPolicy,
+        retries: int = 3,
+        max_workers: int = 4,
+    ) -> None:
+        self.session = session
+        self.policy = policy
+        self.retries = retries
+        self._max_workers = max_workers
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="download-hedge"
+        )
+
+    @property
+    def headers(self):
+        return self.session.headers
+
+    def mount(self, prefix, adapter):
+        return self.session.mount(prefix, adapter)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        close = getattr(self.session, "close", None)
+        if close is not None:
+            close()
+
+    def get(self, url: str, timeout: Optional[float] = None, **kwargs):
+        return self.fetch(url, timeout=timeout, **kwargs)[0]
+
+    def fetch(
+        self,
+        url: str,
+        consume: Optional[Callable[[Any], Any]] = None,
+        discard: Optional[Callable[[Any], None]] = None,
+        timeout: Optional[float] = None,
+        **kwargs,
+    ) -> Tuple[Any, Any]:
+        """GET ``url`` and return the response with ``consume(response)``.
+
+        ``consume`` runs on 2xx responses inside each attempt, so reading a
+        streamed body is timed, hedged and retried like the request itself:
+        errors raised while streaming count against the breaker and the retry
+        budget. Results of hedged attempts that lose are passed to ``discard``.
+        """
+
+        policy = self.policy
+        host = urlparse(url).netloc
+        policy.budget.record_request()
+        attempt = 0
+        while True:
+            if not policy.breaker.allow(host):
+                raise CircuitOpenError(f"Circuit open for host {host}")
+            try:
+                response, value = self._hedged_get(
+                    host, url, timeout, kwargs, consume, discard
+                )
+            except requests.RequestException:
+                policy.breaker.record_failure(host)
+                if not self._may_retry(attempt):
+                    raise
+            except BaseException:
+                # Not the host's fault (e.g. a full disk while staging), but a
+                # half-open probe must not stay outstanding forever.
+                policy.breaker.release_probe(host)
+                raise
+            else:
+                if response.status_code not in policy.status_forcelist:
+                    policy.breaker.record_success(host)
+                    return response, value
+                policy.breaker.record_failure(host)
+                if not self._may_retry(attempt):
+                    return response, value
+                _close_response(response)
+            LOGGER.debug("Retrying %s (attempt %d)", url, attempt + 1)
+            time.sleep(policy.backoff(attempt))
+            attempt += 1
+
+    def _may_retry(self, attempt: int) -> bool:
+        return attempt < self.retries and self.policy.budget.try_acquire()
+
+    def _has_idle_worker(self) -> bool:
+        with self._lock:
+            return self._in_flight < self._max_workers
+
+    def _submit(self, attempt: "_Attempt", args: Tuple) -> Future:
+        with self._lock:
+            self._in_flight += 1
+        # Run in the caller's context: keeps the run id on log records and the
+        # work in the active profiler's CPU stats.
+        context = contextvars.copy_context()
+        future = self._executor.submit(
+            context.run, profiled_call, self._timed_get, attempt, *args
+        )
+        future.add_done_callback(self._finished)
+        return future
+
+    def _finished(self, _future: Future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def _timed_get(
+        self,
+        attempt: "_Attempt",
+        host: str,
+        url: str,
+        timeout: Optional[float],
+        kwargs: Dict,
+        consume: Optional[Callable[[Any], Any]],
+    ) -> Tuple[Any, Any]:
+        start = time.monotonic()
+        response = self.session.get(url, timeout=timeout, **kwargs)
+        if not attempt.bind(response):
+            _close_response(response)
+            return response, None
+        value = None
+        if consume is not None and 200 <= response.status_code < 300:
+            try:
+                value = consume(response)
+            finally:
+                _close_response(response)
+        if response.status_code < 500:
+            self.policy.latency.record(host, time.monotonic() - start)
+        return response, value
+
+    def _hedged_get(
+        self,
+        host: str,
+        url: str,
+        timeout: Optional[float],
+        kwargs: Dict,
+        consume: Optional[Callable[[Any], Any]],
+        discard: Optional[Callable[[Any], None]],
+    ) -> Tuple[Any, Any]:
+        args = (host, url, timeout, kwargs, consume)
+        attempts: Dict[Future, _Attempt] = {}
+        attempt = _Attempt()
+        primary = self._submit(attempt, args)
+        attempts[primary] = attempt
+        pending = {primary}
+        delay = self.policy.hedge_delay(host, timeout)
+        if delay is not None:
+            done, _ = wait(pending, timeout=delay)
+            # A hedge queued behind busy workers cannot beat the primary.
+            if (
+                not done
+                and self._has_idle_worker()
+                and self.policy.budget.try_acquire()
+            ):
+                LOGGER.debug("Hedging request to %s after %.3fs", url, delay)
+                attempt = _Attempt()
+                hedge = self._submit(attempt, args)
+                attempts[hedge] = attempt
+                pending.add(hedge)
+
+        # Retryable statuses only win once every attempt has failed.
+        error: Optional[BaseException] = None
+        retryable: Optional[Future] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                elif future.result()[0].status_code in self.policy.status_forcelist:
+                    retryable = future
+                else:
+                    self._abandon(attempts, future, discard)
+                    return future.result()
+        if retryable is not None:
+            self._abandon(attempts, retryable, discard)
+            return retryable.result()
+        assert error is not None
+        raise error
+
+    @staticmethod
+    def _abandon(
+        attempts: Dict[Future, "_Attempt"],
+        winner: Future,
+        discard: Optional[Callable[[Any], None]],
+    ) -> None:
+        # Abort the losers' streams so they free their workers right away.
+        for future, attempt in attempts.items():
+            if future is winner or future.cancel():
+                continue
+            attempt.cancel()
+            future.add_done_callback(functools.partial(_release_loser, discard))
+
+
+class _Attempt:
+    """Handle on one request attempt, letting a winning hedge abort it."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._response = None
+        self._cancelled = False
+
+    def bind(self, response) -> bool:
+        """Remember ``response``; ``False`` if the attempt was already aborted."""
+
+        with self._lock:
+            self._response = response
+            return not self._cancelled
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._cancelled = True
+            response = self._response
+        if response is not None:
+            _close_response(response)
+
+
+def _close_response(response) -> None:
+    close = getattr(response, "close", None)
+    if close is not None:
+        close()
+
+
+def _release_loser(discard: Optional[Callable[[Any], None]], future: Future) -> None:
+    if future.cancelled() or future.exception() is not None:
+        return
+    response, value = future.result()
+    _close_response(response)
+    if discard is not None and value is not None:
+        discard(value)
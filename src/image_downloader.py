@@ -2,32 +2,42 @@
 
 from __future__ import annotations
 
+import json
 import mimetypes
 import os
 from pathlib import Path
-from typing import List, Sequence
+from typing import (
+    BinaryIO,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
 try:  # pragma: no cover - fallback when requests is unavailable
     import requests
     from requests import Response
     from requests.adapters import HTTPAdapter
-    from urllib3.util.retry import Retry
 except ImportError:  # pragma: no cover
     from . import _requests_compat as requests
 
     Response = requests.Response  # type: ignore
+    HTTPAdapter = requests.HTTPAdapter  # type: ignore
 
-    class HTTPAdapter:  # type: ignore
-        def __init__(self, *_, **__):
-            pass
-
-    class Retry:  # type: ignore
-        def __init__(self, *_, **__):
-            pass
+from .download_policy import AdaptiveSession, DownloadPolicy
+from .profiling import profiled
+from .storage import DEFAULT_STORAGE, Storage, StoredObject
 
 
 DEFAULT_TIMEOUT = 10
 MIN_RESOLUTION = (1080, 1080)
+# Shared so per-host latency history and circuit state survive across products.
+DEFAULT_POLICY = DownloadPolicy()
+VALIDATORS_FILENAME = ".validators.json"
+CHUNK_SIZE = 64 * 1024
 
 
 def _filename_from_url(url: str, index: int) -> str:
@@ -40,22 +50,19 @@ def _filename_from_url(url: str, index: int) -> str:
     return f"image_{index:02d}{ext}"
 
 
-def _create_session(retries: int) -> requests.Session:
+def _create_session(
+    retries: int, policy: DownloadPolicy | None = None
+) -> AdaptiveSession:
+    # Retries are handled by the policy so they count against its retry budget.
     session = requests.Session()
-    retry = Retry(
-        total=retries,
-        read=retries,
-        connect=retries,
-        backoff_factor=0.5,
-        status_forcelist=[500, 502, 503, 504],
-    )
-    adapter = HTTPAdapter(max_retries=retry)
+    adapter = HTTPAdapter(max_retries=0)
     session.mount("http://", adapter)
     session.mount("https://", adapter)
-    return session
+    return AdaptiveSession(session, policy or DEFAULT_POLICY, retries=retries)
 
 
-def _validate_resolution(path: Path) -> bool:
+@profiled("_validate_resolution")
+def _validate_resolution(path: Path | BinaryIO) -> bool:
     try:
         from PIL import Image  # type: ignore
     except ImportError as exc:  # pragma: no cover - requires pillow at runtime
@@ -73,13 +80,110 @@ def _upgrade_url(url: str) -> str:
     return f"{url}{separator}ratio=1"
 
 
+@profiled("_download_single")
 def _download_single(
-    session: requests.Session, url: str, dest: Path, timeout: int
-) -> Response:
-    response = session.get(url, timeout=timeout)
+    session: AdaptiveSession,
+    url: str,
+    dest: Path,
+    timeout: int,
+    headers: Optional[Mapping[str, str]] = None,
+    storage: Storage = DEFAULT_STORAGE,
+) -> Tuple[Response, Optional[StoredObject]]:
+    """Fetch ``url`` into ``storage``; the stored object is ``None`` on a 304.
+
+    The body is staged inside the session's policy-wrapped call, so a stream
+    failing half way is retried and hedged like a failed request.
+    """
+
+    key = dest.as_posix()
+    response, staged = session.fetch(
+        url,
+        consume=lambda response: storage.stage(
+            key, _iter_body(response), _content_length(response)
+        ),
+        discard=storage.discard,
+        timeout=timeout,
+        headers=headers,
+        stream=True,
+    )
     response.raise_for_status()
-    dest.write_bytes(response.content)
-    return response
+    if response.status_code == 304:
+        return response, None
+    if staged is None:
+        raise requests.RequestException(
+            f"Unexpected status {response.status_code} for {url}"
+        )
+    return response, storage.commit(staged)
+
+
+def _iter_body(response: Response) -> Iterable[bytes]:
+    iter_content = getattr(response, "iter_content", None)
+    if iter_content is None:
+        return [response.content]
+    return iter_content(chunk_size=CHUNK_SIZE)
+
+
+def _content_length(response: Response) -> Optional[int]:
+    headers = getattr(response, "headers", None) or {}
+    # Decoded bodies of compressed responses differ in size from the header.
+    if headers.get("Content-Encoding", "identity") != "identity":
+        return None
+    try:
+        return int(headers["Content-Length"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _load_validators(storage: Storage, key: str) -> Dict[str, Dict]:
+    try:
+        data = json.loads(bytes(storage.read(key)).decode("utf-8"))
+    except (OSError, KeyError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _save_validators(storage: Storage, key: str, validators: Dict[str, Dict]) -> None:
+    payload = json.dumps(validators, ensure_ascii=False, indent=2, sort_keys=True)
+    storage.write(key, [payload.encode("utf-8")])
+
+
+def _conditional_headers(
+    entry: Optional[Dict], url: str, storage: Storage, key: str
+) -> Dict:
+    """Build revalidation headers if the stored object still matches ``entry``.
+
+    The SHA-256 is checked last: backends that record it answer from
+    metadata, local files are hashed from disk.
+    """
+
+    if not entry or entry.get("source_url") != url:
+        return {}
+    stored = storage.stat(key)
+    if stored is None or stored.size != entry.get("content_length"):
+        return {}
+    digest = stored.sha256 or storage.checksum(key)
+    if digest is None or digest != entry.get("sha256"):
+        return {}
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def _validator_entry(
+    source_url: str, url: str, stored: StoredObject, response: Optional[Response]
+) -> Dict:
+    response_headers = getattr(response, "headers", None) or {}
+    return {
+        "source_url": source_url,
+        "url": url,
+        "etag": response_headers.get("ETag"),
+        "last_modified": response_headers.get("Last-Modified"),
+        "content_length": stored.size,
+        "sha256": stored.sha256,
+    }
 
 
 def download_images(
@@ -87,33 +191,72 @@ def download_images(
     dest_dir: Path,
     timeout: int = DEFAULT_TIMEOUT,
     retries: int = 3,
+    policy: DownloadPolicy | None = None,
+    storage: Storage = DEFAULT_STORAGE,
 ) -> List[Path]:
     """Download a sequence of image URLs into ``dest_dir``.
 
     The function enforces a minimum resolution defined by ``MIN_RESOLUTION``. If
     the downloaded file does not meet the requirement it retries with a "ratio"
     query parameter typically used by Douyin to request original quality.
+
+    Requests go through ``policy`` (``DEFAULT_POLICY`` when omitted), which
+    hedges slow requests, short-circuits failing hosts and caps retries.
+
+    Validators (ETag, Last-Modified, size and SHA-256) of stored images are kept
+    in ``VALIDATORS_FILENAME`` inside ``dest_dir``. On a refresh, images whose
+    size and SHA-256 still match are revalidated with conditional requests
+    (others are fetched again); a 304 leaves the existing file (and
+    its modification time) untouched so downstream processing can skip it.
+
+    Bodies are streamed into ``storage`` under keys derived from ``dest_dir``
+    and the returned paths are those keys; with the default local storage they
+    are plain file paths.
     """
 
-    dest_dir.mkdir(parents=True, exist_ok=True)
-    session = _create_session(retries)
+    storage.makedirs(dest_dir.as_posix())
+    session = _create_session(retries, policy)
+    validators_key = (dest_dir / VALIDATORS_FILENAME).as_posix()
+    validators = _load_validators(storage, validators_key)
     stored_paths: List[Path] = []
 
-    for index, url in enumerate(image_urls, start=1):
-        filename = _filename_from_url(url, index)
-        path = dest_dir / filename
-        try:
-            _download_single(session, url, path, timeout)
-            if not _validate_resolution(path):
-                upgraded = _upgrade_url(url)
-                if upgraded != url:
-                    _download_single(session, upgraded, path, timeout)
-                if not _validate_resolution(path):
-                    raise ValueError(f"Image from {url} below minimum resolution")
-        except Exception:
-            if path.exists():
-                path.unlink()
-            raise
-        stored_paths.append(path)
+    try:
+        for index, url in enumerate(image_urls, start=1):
+            filename = _filename_from_url(url, index)
+            path = dest_dir / filename
+            key = path.as_posix()
+            entry = validators.pop(filename, None)
+            conditional = _conditional_headers(entry, url, storage, key)
+            request_url = entry["url"] if conditional else url
+            try:
+                response, stored = _download_single(
+                    session,
+                    request_url,
+                    path,
+                    timeout,
+                    headers=conditional or None,
+                    storage=storage,
+                )
+                if stored is None:
+                    validators[filename] = entry
+                    stored_paths.append(path)
+                    continue
+                if not _validate_resolution(storage.source(key)):
+                    upgraded = _upgrade_url(url)
+                    if upgraded != request_url:
+                        request_url = upgraded
+                        response, stored = _download_single(
+                            session, upgraded, path, timeout, storage=storage
+                        )
+                    if not _validate_resolution(storage.source(key)):
+                        raise ValueError(f"Image from {url} below minimum resolution")
+            except Exception:
+                storage.delete(key)
+                raise
+            validators[filename] = _validator_entry(url, request_url, stored, response)
+            stored_paths.append(path)
+    finally:
+        session.close()
+        _save_validators(storage, validators_key, validators)
 
     return stored_paths
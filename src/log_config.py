@@ -0,0 +1,193 @@
+"""Non-blocking structured logging for pipeline runs.
+
+Records are put on an in-memory queue by the calling thread and written to disk
+by a background :class:`logging.handlers.QueueListener`, so workers never wait
+on file I/O. Each record is written as one JSON object carrying the run's
+correlation id; files rotate by size and age, and DEBUG records are sampled.
+"""
+
+from __future__ import annotations
+
+import atexit
+import copy
+import itertools
+import json
+import logging
+import os
+import queue
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from typing import Iterator, Optional
+
+_RUN_ID: ContextVar[str] = ContextVar("run_id", default="-")
+
+
+def current_run_id() -> str:
+    return _RUN_ID.get()
+
+
+@contextmanager
+def run_context(run_id: Optional[str] = None) -> Iterator[str]:
+    """Tag every record logged inside the block with ``run_id``."""
+
+    token = _RUN_ID.set(run_id or uuid.uuid4().hex[:12])
+    try:
+        yield _RUN_ID.get()
+    finally:
+        _RUN_ID.reset(token)
+
+
+class CorrelationFilter(logging.Filter):
+    """Attach the current run id; runs in the thread emitting the record."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.run_id = _RUN_ID.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep one in every ``1 / rate`` records below ``level``."""
+
+    def __init__(self, rate: float, level: int = logging.INFO) -> None:
+        super().__init__()
+        self.level = level
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self._counter = itertools.count()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= self.level:
+            return True
+        if not self.every:
+            return False
+        return next(self._counter) % self.every == 0
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "run_id": getattr(record, "run_id", "-"),
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False)
+
+
+class StructuredQueueHandler(QueueHandler):
+    """Queue records without flattening them into a formatted string.
+
+    :meth:`QueueHandler.prepare` formats the record and drops ``exc_info`` and
+    ``exc_text``, which would fold tracebacks into the message. Here only the
+    message arguments are merged and the traceback is rendered to
+    ``exc_text``, leaving formatting to the listener-side handler.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(
+                    record.exc_info
+                )
+            record.exc_info = None
+        return record
+
+
+def _file_started_at(path: str) -> float:
+    """Best estimate of when the log file at ``path`` was started."""
+
+    try:
+        result = os.stat(path)
+    except OSError:
+        return time.time()
+    birth = getattr(result, "st_birthtime", None)
+    if birth:
+        return birth
+    # Linux has no portable creation time; use the first record's timestamp.
+    try:
+        with open(path, encoding="utf-8") as stream:
+            first = json.loads(stream.readline())
+        return datetime.fromisoformat(first["ts"]).timestamp()
+    except (OSError, ValueError, KeyError, TypeError):
+        return result.st_mtime
+
+
+class SizeAndTimeRotatingFileHandler(RotatingFileHandler):
+    """Rotate when the file exceeds ``maxBytes`` or is older than ``interval``.
+
+    The age is measured from when the file was started, not from when the
+    handler was created, so short-lived CLI processes still rotate.
+    """
+
+    def __init__(self, filename, interval: float, **kwargs) -> None:
+        super().__init__(filename, **kwargs)
+        self.interval = interval
+        self._opened_at = _file_started_at(self.baseFilename)
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.interval and time.time() - self._opened_at >= self.interval:
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self) -> None:
+        super().doRollover()
+        self._opened_at = time.time()
+
+
+def _stop_listener(listener: QueueListener) -> None:
+    # ``QueueListener.stop`` is not idempotent before Python 3.12.
+    if getattr(listener, "_thread", None) is not None:
+        listener.stop()
+
+
+def configure_logging(
+    logger: logging.Logger,
+    path: Path,
+    level: int = logging.INFO,
+    max_bytes: int = 10 * 1024 * 1024,
+    backup_count: int = 5,
+    rotate_interval: float = 24 * 60 * 60,
+    debug_sample_rate: float = 0.01,
+) -> QueueListener:
+    """Attach a queue-backed JSON file handler to ``logger``.
+
+    The returned listener is already started and is stopped at interpreter
+    exit, flushing any queued records.
+    """
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    file_handler = SizeAndTimeRotatingFileHandler(
+        path,
+        interval=rotate_interval,
+        maxBytes=max_bytes,
+        backupCount=backup_count,
+        encoding="utf-8",
+    )
+    file_handler.setFormatter(JsonFormatter())
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = StructuredQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(debug_sample_rate))
+    queue_handler.addFilter(CorrelationFilter())
+
+    logger.addHandler(queue_handler)
+    logger.setLevel(level)
+    logger.propagate = False
+
+    listener = QueueListener(log_queue, file_handler)
+    listener.start()
+    atexit.register(_stop_listener, listener)
+    return listener
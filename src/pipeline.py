@@ -4,52 +4,110 @@ from __future__ import annotations
 
 import logging
 from pathlib import Path
-from typing import Dict
 
-from .background_removal import process_batch
+from .background_removal import output_path_for, process_batch
 from .douyin_client import DouyinClient
 from .image_downloader import download_images
 from .link_parser import extract_product_id
+from .log_config import configure_logging, run_context
+from .profiling import PipelineProfiler
+from .records import ImageRecord, PipelineResult
+from .storage import DEFAULT_STORAGE, Storage
 
 LOGGER = logging.getLogger(__name__)
 _LOG_PATH = Path("logs/pipeline.log")
-if not _LOG_PATH.parent.exists():  # pragma: no cover - filesystem setup
-    _LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
 
 if not LOGGER.handlers:  # pragma: no cover - side effect guard
-    _handler = logging.FileHandler(_LOG_PATH)
-    _handler.setFormatter(
-        logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s")
-    )
-    LOGGER.addHandler(_handler)
-    LOGGER.setLevel(logging.INFO)
-    LOGGER.propagate = False
+    configure_logging(LOGGER, _LOG_PATH)
+
+
+def run_pipeline(
+    raw_text: str,
+    output_dir: Path,
+    profile: bool = False,
+    storage: Storage = DEFAULT_STORAGE,
+) -> PipelineResult:
+    """Execute the whole pipeline and return processed result information.
+
+    With ``profile`` enabled, CPU, memory and per-stage timings are written to
+    ``<output_dir>/<product_id>/profile``. Log records of the run share a
+    correlation id (``run_id``). Images are written to ``storage``, local
+    files by default.
+    """
+
+    with run_context():
+        if not profile:
+            return _run_stages(_extract(raw_text), output_dir, storage)
+        return _run_profiled(raw_text, output_dir, storage)
 
 
-def run_pipeline(raw_text: str, output_dir: Path) -> Dict:
-    """Execute the whole pipeline and return processed result information."""
+def _run_profiled(raw_text: str, output_dir: Path, storage: Storage) -> PipelineResult:
+    # Failing runs are the ones worth diagnosing, so the report is written even
+    # when a stage raises, as long as the product id is known.
+    product_id = None
+    error = None
+    profiler = PipelineProfiler()
+    try:
+        with profiler:
+            product_id = _extract(raw_text)
+            return _run_stages(product_id, output_dir, storage)
+    except Exception as exc:
+        error = repr(exc)
+        raise
+    finally:
+        if product_id is not None:
+            try:
+                report_path = profiler.write(
+                    output_dir / product_id / "profile", error=error
+                )
+            except OSError as exc:  # pragma: no cover - keep the original error
+                LOGGER.error("Failed to write profile for %s: %s", product_id, exc)
+            else:
+                LOGGER.info("Wrote profile for %s to %s", product_id, report_path)
 
-    LOGGER.info("Starting pipeline for input: %s", raw_text[:200])
+
+def _extract(raw_text: str) -> str:
+    LOGGER.info("Starting pipeline")
+    LOGGER.debug("Raw input: %s", raw_text[:200])
     product_id = extract_product_id(raw_text)
     LOGGER.info("Extracted product id: %s", product_id)
+    return product_id
+
 
+def _run_stages(product_id: str, output_dir: Path, storage: Storage) -> PipelineResult:
     client = DouyinClient()
     product_detail = client.fetch_product_detail(product_id)
     LOGGER.info("Fetched product detail for %s", product_id)
 
     download_dir = output_dir / product_id / "original"
-    downloaded_paths = download_images(product_detail["images"], download_dir)
+    downloaded_paths = download_images(
+        product_detail["images"], download_dir, storage=storage
+    )
     LOGGER.info("Downloaded %d images", len(downloaded_paths))
 
     processed_dir = output_dir / product_id / "processed"
-    processed_paths = process_batch(downloaded_paths, processed_dir)
+    processed_paths = process_batch(downloaded_paths, processed_dir, storage=storage)
     LOGGER.info("Processed %d images", len(processed_paths))
 
-    return {
-        "product_id": product_id,
-        "product_detail": product_detail,
-        "download_dir": download_dir,
-        "processed_dir": processed_dir,
-        "downloaded_images": downloaded_paths,
-        "processed_images": processed_paths,
-    }
+    processed_set = set(processed_paths)
+    images = []
+    for index, (url, path) in enumerate(
+        zip(product_detail["images"], downloaded_paths), start=1
+    ):
+        output_path = output_path_for(path, processed_dir)
+        images.append(
+            ImageRecord(
+                index=index,
+                url=url,
+                original=str(path),
+                processed=str(output_path) if output_path in processed_set else None,
+            )
+        )
+
+    return PipelineResult(
+        product_id=product_id,
+        title=product_detail.get("title", ""),
+        download_dir=str(download_dir),
+        processed_dir=str(processed_dir),
+        images=tuple(images),
+    )
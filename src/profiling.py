@@ -0,0 +1,252 @@
+"""Opt-in CPU and memory profiling for pipeline runs.
+
+Functions decorated with :func:`profiled` record their wall time while a
+:class:`PipelineProfiler` is active in the current context and are otherwise a
+plain pass-through. The profiler also captures cProfile statistics and the
+tracemalloc peak, and writes everything as machine-readable artifacts.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import functools
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextvars import ContextVar, Token
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+LOGGER = logging.getLogger(__name__)
+
+PSTATS_FILENAME = "cprofile.pstats"
+REPORT_FILENAME = "profile.json"
+
+_F = TypeVar("_F", bound=Callable[..., Any])
+_ACTIVE: ContextVar[Optional["PipelineProfiler"]] = ContextVar(
+    "active_profiler", default=None
+)
+
+# tracemalloc is process wide: overlapping profilers share one tracing session,
+# started by the first active profiler and stopped by the last one.
+_TRACING_LOCK = threading.Lock()
+_tracing_users = 0
+_tracing_owned = False
+_tracing_acquisitions = 0
+
+
+def _acquire_tracing() -> Tuple[bool, int]:
+    """Register a tracemalloc user.
+
+    Returns whether no other profiler was active and the acquisition serial,
+    which :func:`_release_tracing` uses to detect profilers that started later.
+    """
+
+    global _tracing_users, _tracing_owned, _tracing_acquisitions
+    with _TRACING_LOCK:
+        alone = _tracing_users == 0
+        if alone:
+            _tracing_owned = not tracemalloc.is_tracing()
+            if _tracing_owned:
+                tracemalloc.start()
+            # Only the first user resets, so overlapping runs keep their peak.
+            tracemalloc.reset_peak()
+        _tracing_users += 1
+        _tracing_acquisitions += 1
+        return alone, _tracing_acquisitions
+
+
+def _release_tracing(serial: int) -> bool:
+    """Unregister a user; return ``True`` if nobody overlapped since ``serial``."""
+
+    global _tracing_users, _tracing_owned
+    with _TRACING_LOCK:
+        _tracing_users -= 1
+        undisturbed = _tracing_acquisitions == serial
+        if _tracing_users == 0 and _tracing_owned:
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            _tracing_owned = False
+        return undisturbed
+
+
+def _label(args: tuple) -> Optional[str]:
+    for arg in args:
+        if isinstance(arg, (str, os.PathLike)):
+            return str(arg)
+    return None
+
+
+def profiled(stage: str) -> Callable[[_F], _F]:
+    """Record per-call timings of the decorated function under ``stage``.
+
+    The label of each timing is the first string or path argument, which is the
+    product id, URL or image path for the instrumented pipeline functions.
+    """
+
+    def decorator(func: _F) -> _F:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = _ACTIVE.get()
+            if profiler is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            ok = False
+            try:
+                result = func(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                profiler.record(stage, _label(args), time.perf_counter() - start, ok)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+def profiled_call(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Call ``func``, adding its CPU stats to the active profiler if any.
+
+    cProfile only sees the thread that enabled it. Code handing work to other
+    threads submits ``copy_context().run(profiled_call, func, ...)`` so the
+    work is attributed to the submitting run.
+    """
+
+    profiler = _ACTIVE.get()
+    if profiler is None:
+        return func(*args, **kwargs)
+    return profiler.profile_call(func, *args, **kwargs)
+
+
+class PipelineProfiler:
+    """Context manager collecting cProfile, tracemalloc and stage timings."""
+
+    def __init__(self, top_allocations: int = 25) -> None:
+        self.top_allocations = top_allocations
+        self.timings: List[Dict[str, Any]] = []
+        self.wall_time = 0.0
+        self.peak_memory: Optional[int] = None
+        self.allocations: Optional[List[Dict[str, Any]]] = None
+        self.exclusive_memory = True
+        self._profile: Optional[cProfile.Profile] = None
+        self._thread_profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+        self._token: Optional[Token] = None
+        self._tracing_serial = 0
+        self._start = 0.0
+
+    def __enter__(self) -> "PipelineProfiler":
+        self._token = _ACTIVE.set(self)
+        self.exclusive_memory, self._tracing_serial = _acquire_tracing()
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as exc:  # another profiler is active in this process
+            LOGGER.warning("cProfile unavailable, skipping CPU stats: %s", exc)
+        else:
+            self._profile = profile
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.wall_time = time.perf_counter() - self._start
+        if self._profile is not None:
+            self._profile.disable()
+        try:
+            self._collect_memory()
+        finally:
+            undisturbed = _release_tracing(self._tracing_serial)
+            self.exclusive_memory = self.exclusive_memory and undisturbed
+            if self._token is not None:
+                _ACTIVE.reset(self._token)
+
+    def _collect_memory(self) -> None:
+        # Tracing may have been stopped by code outside the profiler.
+        if not tracemalloc.is_tracing():
+            LOGGER.warning("tracemalloc not tracing, memory stats unavailable")
+            return
+        self.peak_memory = tracemalloc.get_traced_memory()[1]
+        statistics = tracemalloc.take_snapshot().statistics("lineno")
+        self.allocations = [
+            {
+                "location": str(stat.traceback),
+                "size_bytes": stat.size,
+                "count": stat.count,
+            }
+            for stat in statistics[: self.top_allocations]
+        ]
+
+    def profile_call(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run ``func`` in the current thread under its own cProfile."""
+
+        if self._profile is None:
+            return func(*args, **kwargs)
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:  # the thread is already being profiled
+            return func(*args, **kwargs)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+            with self._lock:
+                self._thread_profiles.append(profile)
+
+    def record(
+        self, stage: str, label: Optional[str], seconds: float, ok: bool
+    ) -> None:
+        self.timings.append(
+            {"stage": stage, "label": label, "seconds": seconds, "ok": ok}
+        )
+
+    def stage_summary(self) -> Dict[str, Dict[str, float]]:
+        summary: Dict[str, Dict[str, float]] = {}
+        for timing in self.timings:
+            stage = summary.setdefault(
+                timing["stage"], {"calls": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            )
+            stage["calls"] += 1
+            stage["total_seconds"] += timing["seconds"]
+            stage["max_seconds"] = max(stage["max_seconds"], timing["seconds"])
+        return summary
+
+    def write(self, directory: Path, error: Optional[str] = None) -> Path:
+        """Write ``profile.json`` (and cProfile stats if captured) to ``directory``.
+
+        ``tracemalloc`` is process wide: when runs overlap, the peak covers every
+        run active since the first of them started and ``memory.exclusive`` is
+        false. Memory fields are ``null`` when tracing was unavailable. CPU stats
+        include work submitted through :func:`profiled_call` from other threads,
+        such as downloads running in session worker threads.
+        """
+
+        directory.mkdir(parents=True, exist_ok=True)
+        report = {
+            "wall_time_seconds": self.wall_time,
+            "error": error,
+            "memory": {
+                "peak_bytes": self.peak_memory,
+                "exclusive": self.exclusive_memory,
+                "top_allocations": self.allocations,
+            },
+            "stages": self.stage_summary(),
+            "timings": self.timings,
+            "cprofile": None,
+        }
+        if self._profile is not None:
+            stats = pstats.Stats(self._profile)
+            with self._lock:
+                for profile in self._thread_profiles:
+                    stats.add(profile)
+            stats.dump_stats(str(directory / PSTATS_FILENAME))
+            report["cprofile"] = PSTATS_FILENAME
+        report_path = directory / REPORT_FILENAME
+        report_path.write_text(
+            json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        return report_path
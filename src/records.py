@@ -0,0 +1,220 @@
+"""Compact record types for product details and pipeline results.
+
+Records are frozen, slotted dataclasses storing plain strings instead of
+``Path`` objects so that batch runs can keep many results in memory cheaply.
+For backwards compatibility they are read-only :class:`~collections.abc.Mapping`
+objects exposing the keys of the dicts they replace (``result["processed_images"]``,
+iteration, ``dict(result)``, comparison with dicts). They are not ``dict``
+subclasses, so serialise them with ``to_dict()`` rather than ``json.dumps``.
+
+Bulk export is available as JSON lines (:func:`write_jsonl`) or as flat
+columns with one row per image (:func:`to_columns`), which can be handed to
+``pyarrow.Table.from_pydict`` or written directly with :func:`write_parquet`.
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Mapping
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import (
+    Any,
+    ClassVar,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    TextIO,
+    Tuple,
+)
+
+
+class _RecordMapping(Mapping):
+    """Read-only mapping over a record's legacy keys.
+
+    ``_LEGACY_KEYS`` maps each legacy key to the attribute or property holding
+    its value, so a lookup only computes the value that was asked for.
+    """
+
+    __slots__ = ()
+    _LEGACY_KEYS: ClassVar[Dict[str, str]] = {}
+
+    def __getitem__(self, key: str) -> Any:
+        return getattr(self, self._LEGACY_KEYS[key])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._LEGACY_KEYS)
+
+    def __len__(self) -> int:
+        return len(self._LEGACY_KEYS)
+
+    def _field_values(self) -> Tuple[Any, ...]:
+        return tuple(getattr(self, item.name) for item in fields(self))
+
+    def __eq__(self, other: object) -> bool:
+        if type(other) is type(self):
+            return self._field_values() == other._field_values()
+        if isinstance(other, Mapping):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self._field_values())
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class ProductDetail(_RecordMapping):
+    """Normalised product information returned by the Douyin client."""
+
+    _LEGACY_KEYS: ClassVar[Dict[str, str]] = {
+        "product_id": "product_id",
+        "title": "title",
+        "images": "images",
+    }
+
+    product_id: str
+    title: str
+    images: Tuple[str, ...]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "product_id": self.product_id,
+            "title": self.title,
+            "images": list(self.images),
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class ImageRecord:
+    """A single product image: source URL, stored original and matted output."""
+
+    index: int
+    url: str
+    original: str
+    processed: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "index": self.index,
+            "url": self.url,
+            "original": self.original,
+            "processed": self.processed,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ImageRecord":
+        return cls(data["index"], data["url"], data["original"], data.get("processed"))
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class PipelineResult(_RecordMapping):
+    """Outcome of :func:`src.pipeline.run_pipeline` for one product."""
+
+    _LEGACY_KEYS: ClassVar[Dict[str, str]] = {
+        "product_id": "product_id",
+        "product_detail": "product_detail",
+        "download_dir": "download_path",
+        "processed_dir": "processed_path",
+        "downloaded_images": "downloaded_images",
+        "processed_images": "processed_images",
+    }
+
+    product_id: str
+    title: str
+    download_dir: str
+    processed_dir: str
+    images: Tuple[ImageRecord, ...]
+
+    @property
+    def download_path(self) -> Path:
+        return Path(self.download_dir)
+
+    @property
+    def processed_path(self) -> Path:
+        return Path(self.processed_dir)
+
+    @property
+    def product_detail(self) -> ProductDetail:
+        return ProductDetail(
+            self.product_id, self.title, tuple(image.url for image in self.images)
+        )
+
+    @property
+    def downloaded_images(self) -> List[Path]:
+        return [Path(image.original) for image in self.images]
+
+    @property
+    def processed_images(self) -> List[Path]:
+        return [Path(image.processed) for image in self.images if image.processed]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "product_id": self.product_id,
+            "title": self.title,
+            "download_dir": self.download_dir,
+            "processed_dir": self.processed_dir,
+            "images": [image.to_dict() for image in self.images],
+        }
+
+    def to_json_line(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PipelineResult":
+        return cls(
+            data["product_id"],
+            data["title"],
+            data["download_dir"],
+            data["processed_dir"],
+            tuple(ImageRecord.from_dict(image) for image in data["images"]),
+        )
+
+
+def write_jsonl(results: Iterable[PipelineResult], stream: TextIO) -> int:
+    """Write one JSON object per line and return the number of records."""
+
+    count = 0
+    for result in results:
+        stream.write(result.to_json_line())
+        stream.write("\n")
+        count += 1
+    return count
+
+
+def read_jsonl(stream: TextIO) -> Iterator[PipelineResult]:
+    for line in stream:
+        if line.strip():
+            yield PipelineResult.from_dict(json.loads(line))
+
+
+COLUMNS = ("product_id", "title", "image_index", "url", "original", "processed")
+
+
+def to_columns(results: Iterable[PipelineResult]) -> Dict[str, List[Any]]:
+    """Flatten results into columns with one row per image."""
+
+    columns: Dict[str, List[Any]] = {name: [] for name in COLUMNS}
+    for result in results:
+        for image in result.images:
+            columns["product_id"].append(result.product_id)
+            columns["title"].append(result.title)
+            columns["image_index"].append(image.index)
+            columns["url"].append(image.url)
+            columns["original"].append(image.original)
+            columns["processed"].append(image.processed)
+    return columns
+
+
+def write_parquet(results: Iterable[PipelineResult], path: Path) -> Path:
+    """Write :func:`to_columns` output to a Parquet file using pyarrow."""
+
+    try:
+        import pyarrow as pa  # type: ignore
+        import pyarrow.parquet as pq  # type: ignore
+    except ImportError as exc:  # pragma: no cover - optional dependency
+        raise ImportError("pyarrow is required for Parquet export") from exc
+
+    pq.write_table(pa.Table.from_pydict(to_columns(results)), str(path))
+    return path
@@ -0,0 +1,235 @@
+"""Priority-aware scheduling of pipeline runs.
+
+Interactive single-product requests and bulk backfills share the same pool of
+workers. The scheduler keeps a queue per priority class and dispatches with the
+following rules:
+
+* classes are served in ``PRIORITY_CLASSES`` order, so queued interactive work
+  always starts before bulk work,
+* each class has a concurrency quota; by default bulk may use every worker but
+  one (the only worker when ``workers=1``, so no slot is reserved then),
+  keeping a slot free for interactive arrivals while idle capacity still goes
+  to bulk throughput,
+* inside a class, tenants are served by start-time fair queuing: the tenant
+  that has started the fewest jobs goes first, and a tenant becoming active
+  starts at the class's current virtual time, so one large backfill cannot
+  starve tenants that arrive later (nor be starved by them),
+* inside a tenant, jobs run earliest-deadline-first (then FIFO); jobs whose
+  deadline has already passed when dispatched fail with
+  :class:`DeadlineExceededError` instead of occupying a worker.
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from .pipeline import run_pipeline
+
+LOGGER = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BULK = "bulk"
+PRIORITY_CLASSES = (PRIORITY_INTERACTIVE, PRIORITY_BULK)
+DEFAULT_TENANT = "default"
+
+
+class DeadlineExceededError(RuntimeError):
+    """Raised when a job's deadline passes before it could be started."""
+
+
+@dataclass
+class _Job:
+    priority: str
+    tenant: str
+    deadline: Optional[float]
+    args: Tuple[Any, ...]
+    kwargs: Dict[str, Any]
+    future: Future = field(default_factory=Future)
+
+
+class PipelineScheduler:
+    """Run pipeline jobs on a worker pool honouring priorities and quotas."""
+
+    def __init__(
+        self,
+        workers: int = 4,
+        quotas: Optional[Mapping[str, int]] = None,
+        runner: Callable[..., Any] = run_pipeline,
+    ) -> None:
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.workers = workers
+        self.runner = runner
+        self.quotas: Dict[str, int] = {
+            PRIORITY_INTERACTIVE: workers,
+            PRIORITY_BULK: max(1, workers - 1),
+        }
+        if quotas:
+            self.quotas.update(quotas)
+
+        self._queues: Dict[str, Dict[str, List]] = {
+            cls: {} for cls in PRIORITY_CLASSES
+        }
+        self._running: Dict[str, Dict[str, int]] = {
+            cls: {} for cls in PRIORITY_CLASSES
+        }
+        # Jobs started per tenant and the per-class virtual time, i.e. the
+        # service count of the most recently dispatched tenant.
+        self._served: Dict[str, Dict[str, int]] = {
+            cls: {} for cls in PRIORITY_CLASSES
+        }
+        self._virtual_time: Dict[str, int] = {cls: 0 for cls in PRIORITY_CLASSES}
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._shutdown = False
+        self._threads = [
+            threading.Thread(
+                target=self._worker, name=f"pipeline-worker-{index}", daemon=True
+            )
+            for index in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def __enter__(self) -> "PipelineScheduler":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.shutdown()
+
+    def submit(
+        self,
+        raw_text: str,
+        output_dir: Path,
+        priority: str = PRIORITY_BULK,
+        tenant: str = DEFAULT_TENANT,
+        deadline: Optional[float] = None,
+        **kwargs: Any,
+    ) -> Future:
+        """Queue a pipeline run and return a future for its result.
+
+        ``deadline`` is a number of seconds from now by which the job should
+        start; extra keyword arguments are passed through to the runner.
+        """
+
+        if priority not in self._queues:
+            raise ValueError(f"Unknown priority class: {priority}")
+        job = _Job(
+            priority=priority,
+            tenant=tenant,
+            deadline=None if deadline is None else time.monotonic() + deadline,
+            args=(raw_text, output_dir),
+            kwargs=kwargs,
+        )
+        sort_key = (
+            float("inf") if job.deadline is None else job.deadline,
+            next(self._counter),
+        )
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("Scheduler has been shut down")
+            queues = self._queues[priority]
+            if tenant not in queues:
+                served = self._served[priority]
+                served[tenant] = max(
+                    served.get(tenant, 0), self._virtual_time[priority]
+                )
+            queue = queues.setdefault(tenant, [])
+            heapq.heappush(queue, (sort_key, job))
+            self._condition.notify()
+        return job.future
+
+    def pending(self, priority: Optional[str] = None) -> int:
+        """Return the number of queued (not yet started) jobs."""
+
+        with self._condition:
+            classes = [priority] if priority else PRIORITY_CLASSES
+            return sum(
+                len(queue)
+                for cls in classes
+                for queue in self._queues[cls].values()
+            )
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting jobs; queued jobs still run before workers exit."""
+
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _next_job(self) -> Optional[_Job]:
+        for cls in PRIORITY_CLASSES:
+            running = self._running[cls]
+            if sum(running.values()) >= self.quotas.get(cls, self.workers):
+                continue
+            queues = self._queues[cls]
+            if not queues:
+                continue
+            served = self._served[cls]
+            tenant = min(queues, key=lambda name: (served[name], queues[name][0][0]))
+            self._virtual_time[cls] = served[tenant]
+            served[tenant] += 1
+            _, job = heapq.heappop(queues[tenant])
+            if not queues[tenant]:
+                del queues[tenant]
+            return job
+        return None
+
+    def _has_queued(self) -> bool:
+        return any(self._queues[cls] for cls in PRIORITY_CLASSES)
+
+    def _worker(self) -> None:
+        while True:
+            with self._condition:
+                job = self._next_job()
+                while job is None:
+                    if self._shutdown and not self._has_queued():
+                        return
+                    self._condition.wait()
+                    job = self._next_job()
+                running = self._running[job.priority]
+                running[job.tenant] = running.get(job.tenant, 0) + 1
+            try:
+                self._run(job)
+            finally:
+                with self._condition:
+                    running = self._running[job.priority]
+                    running[job.tenant] -= 1
+                    if not running[job.tenant]:
+                        del running[job.tenant]
+                        # An idle tenant re-enters at the virtual time, so its
+                        # service count can go.
+                        if job.tenant not in self._queues[job.priority]:
+                            self._served[job.priority].pop(job.tenant, None)
+                    self._condition.notify_all()
+
+    def _run(self, job: _Job) -> None:
+        if not job.future.set_running_or_notify_cancel():
+            return
+        if job.deadline is not None and time.monotonic() > job.deadline:
+            LOGGER.warning(
+                "Dropping %s job for tenant %s: deadline exceeded",
+                job.priority,
+                job.tenant,
+            )
+            job.future.set_exception(
+                DeadlineExceededError("Job deadline passed before it started")
+            )
+            return
+        try:
+            result = self.runner(*job.args, **job.kwargs)
+        except BaseException as exc:
+            job.future.set_exception(exc)
+        else:
+            job.future.set_result(result)
@@ -0,0 +1,511 @@
+"""Storage backends for downloaded and processed images.
+
+Pipeline code addresses stored objects by key, a ``/`` separated path such as
+``output/123/original/image_01.jpg``. Writes happen in two steps: :meth:`stage`
+streams the body chunk by chunk into a private location (a temporary file, or
+space reserved in the packed archive), hashing it on the way (MD5 for the
+ETag, SHA-256 for validators), and :meth:`commit` makes it visible under its
+key. Streamed downloads are therefore never joined into a full-body copy in
+memory, several writers can stage concurrently, and a staged body that loses a
+hedged race is simply discarded.
+
+* :class:`LocalStorage` keeps one file per key (the historical layout).
+* :class:`PackedArchiveStorage` appends every object to a single data file
+  with an append-only index; reads are zero-copy slices of an ``mmap``.
+* :class:`ObjectStoreStorage` is a local stand-in for an S3-compatible bucket
+  with ETags and ``put_object``/``get_object`` style helpers.
+"""
+
+from __future__ import annotations
+
+import abc
+import hashlib
+import io
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, Optional, Union
+
+Chunks = Iterable[Union[bytes, bytearray, memoryview]]
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass(frozen=True, slots=True)
+class StoredObject:
+    """Metadata of a stored object.
+
+    ``sha256`` is only known when the backend recorded it at write time.
+    """
+
+    key: str
+    size: int
+    modified: float
+    etag: Optional[str] = None
+    sha256: Optional[str] = None
+
+
+@dataclass(frozen=True, slots=True)
+class StagedObject:
+    """A written body waiting to be committed.
+
+    The body is either in the temporary file ``temp_path`` or, for backends
+    that can reserve space, already in place at ``offset``.
+    """
+
+    key: str
+    size: int
+    etag: str
+    sha256: str
+    temp_path: Optional[Path] = None
+    offset: Optional[int] = None
+
+
+class MemoryViewReader(io.RawIOBase):
+    """Seekable read-only file over a memory view, without copying it."""
+
+    def __init__(self, view: Union[bytes, memoryview]) -> None:
+        super().__init__()
+        self._view = memoryview(view)
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), len(self._view) - self._position)
+        if size <= 0:
+            return 0
+        buffer[:size] = self._view[self._position : self._position + size]
+        self._position += size
+        return size
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        if offset < 0:
+            raise ValueError("negative seek position")
+        self._position = offset
+        return offset
+
+    def tell(self) -> int:
+        return self._position
+
+
+def _stage_file(directory: Path, key: str, chunks: Chunks) -> StagedObject:
+    directory.mkdir(parents=True, exist_ok=True)
+    handle, name = tempfile.mkstemp(dir=directory, prefix=".", suffix=".part")
+    temp_path = Path(name)
+    md5 = hashlib.md5()
+    sha256 = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(handle, "wb") as stream:
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                stream.write(chunk)
+                md5.update(chunk)
+                sha256.update(chunk)
+                size += len(chunk)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+    return StagedObject(
+        key, size, md5.hexdigest(), sha256.hexdigest(), temp_path=temp_path
+    )
+
+
+class Storage(abc.ABC):
+    """Interface shared by all storage backends."""
+
+    @abc.abstractmethod
+    def stage(
+        self, key: str, chunks: Chunks, size: Optional[int] = None
+    ) -> StagedObject:
+        """Stream ``chunks`` to a private location for ``key``.
+
+        ``size`` is the expected body size (e.g. ``Content-Length``) if known.
+        """
+
+    @abc.abstractmethod
+    def commit(self, staged: StagedObject) -> StoredObject:
+        """Publish a staged body under its key."""
+
+    @abc.abstractmethod
+    def read(self, key: str) -> Union[bytes, memoryview]:
+        """Return the body stored under ``key``."""
+
+    @abc.abstractmethod
+    def stat(self, key: str) -> Optional[StoredObject]:
+        """Return metadata for ``key`` or ``None`` when it does not exist."""
+
+    @abc.abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove ``key``; missing keys are ignored."""
+
+    def write(
+        self, key: str, chunks: Chunks, size: Optional[int] = None
+    ) -> StoredObject:
+        return self.commit(self.stage(key, chunks, size))
+
+    def discard(self, staged: StagedObject) -> None:
+        if staged.temp_path is not None:
+            staged.temp_path.unlink(missing_ok=True)
+
+    def exists(self, key: str) -> bool:
+        return self.stat(key) is not None
+
+    def checksum(self, key: str) -> Optional[str]:
+        """Return the SHA-256 hex digest of ``key`` if the backend knows it."""
+
+        stored = self.stat(key)
+        return stored.sha256 if stored is not None else None
+
+    def makedirs(self, prefix: str) -> None:
+        """Prepare ``prefix`` for writes; only meaningful for directory layouts."""
+
+    def source(self, key: str) -> Union[Path, BinaryIO]:
+        """Return something image readers such as Pillow can open."""
+
+        return io.BufferedReader(MemoryViewReader(self.read(key)))
+
+
+class LocalStorage(Storage):
+    """One file per key below ``root`` (or keys used as paths when ``None``)."""
+
+    def __init__(self, root: Optional[Path] = None) -> None:
+        self.root = root
+
+    def locate(self, key: str) -> Path:
+        """Return the file path backing ``key``."""
+
+        return self.root / key.lstrip("/") if self.root is not None else Path(key)
+
+    def makedirs(self, prefix: str) -> None:
+        self.locate(prefix).mkdir(parents=True, exist_ok=True)
+
+    def stage(
+        self, key: str, chunks: Chunks, size: Optional[int] = None
+    ) -> StagedObject:
+        # Staged next to the target so the commit is an atomic rename.
+        return _stage_file(self.locate(key).parent, key, chunks)
+
+    def commit(self, staged: StagedObject) -> StoredObject:
+        path = self.locate(staged.key)
+        os.replace(staged.temp_path, path)
+        return StoredObject(
+            staged.key,
+            staged.size,
+            path.stat().st_mtime,
+            staged.etag,
+            staged.sha256,
+        )
+
+    def read(self, key: str) -> bytes:
+        return self.locate(key).read_bytes()
+
+    def source(self, key: str) -> Path:
+        return self.locate(key)
+
+    def stat(self, key: str) -> Optional[StoredObject]:
+        try:
+            result = self.locate(key).stat()
+        except OSError:
+            return None
+        return StoredObject(key, result.st_size, result.st_mtime)
+
+    def checksum(self, key: str) -> Optional[str]:
+        # Plain files carry no recorded digest, so hash the file on disk.
+        digest = hashlib.sha256()
+        try:
+            with self.locate(key).open("rb") as stream:
+                for chunk in iter(lambda: stream.read(_HASH_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+        except OSError:
+            return None
+        return digest.hexdigest()
+
+    def delete(self, key: str) -> None:
+        self.locate(key).unlink(missing_ok=True)
+
+
+def _append_file(target: BinaryIO, offset: int, source: Path, size: int) -> None:
+    with source.open("rb") as stream:
+        copy_file_range = getattr(os, "copy_file_range", None)
+        if copy_file_range is not None:
+            copied = 0
+            try:
+                # In-kernel copy, the body never passes through user space.
+                while copied < size:
+                    count = copy_file_range(
+                        stream.fileno(),
+                        target.fileno(),
+                        size - copied,
+                        copied,
+                        offset + copied,
+                    )
+                    if count == 0:
+                        break
+                    copied += count
+                if copied == size:
+                    return
+            except OSError:
+                pass
+        stream.seek(0)
+        target.seek(offset)
+        shutil.copyfileobj(stream, target, _HASH_CHUNK_SIZE)
+        target.flush()
+
+
+class PackedArchiveStorage(Storage):
+    """Append-only single-file archive with a JSON-lines index.
+
+    Objects are appended to ``path`` and described by one index line in
+    ``path.idx``; rewriting a key appends a new version and deleting it appends
+    a tombstone, the last line for a key wins.
+
+    When the body size is known, a region at the archive's tail is reserved and
+    the body is streamed straight into it, so no per-object file is created.
+    Bodies of unknown size are spooled to ``spool_dir`` (the system temporary
+    directory by default, which should be local disk) and copied in once
+    complete. The lock is only held to reserve space and to publish index
+    lines, never while a body streams. Bodies longer than announced continue
+    in the spool; reserved space of failed or short writes is left unused.
+    The archive is safe to share between threads of one process but not
+    between processes.
+    """
+
+    def __init__(self, path: Path, spool_dir: Optional[Path] = None) -> None:
+        self.path = path
+        self.index_path = path.with_name(f"{path.name}.idx")
+        self.spool_dir = spool_dir or Path(tempfile.gettempdir())
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._mmap: Optional[mmap.mmap] = None
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch(exist_ok=True)
+        self._tail = path.stat().st_size
+        if self.index_path.exists():
+            with self.index_path.open("r", encoding="utf-8") as index:
+                for line in index:
+                    if line.strip():
+                        self._apply(json.loads(line))
+
+    def _apply(self, entry: Dict) -> None:
+        if entry.get("deleted"):
+            self._entries.pop(entry["key"], None)
+        else:
+            self._entries[entry["key"]] = entry
+
+    def _append_index(self, entry: Dict) -> None:
+        with self.index_path.open("a", encoding="utf-8") as index:
+            index.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._apply(entry)
+
+    def _reserve(self, size: int) -> int:
+        with self._lock:
+            offset = self._tail
+            self._tail += size
+            return offset
+
+    def stage(
+        self, key: str, chunks: Chunks, size: Optional[int] = None
+    ) -> StagedObject:
+        if size is None:
+            return _stage_file(self.spool_dir, key, chunks)
+        offset = self._reserve(size)
+        md5 = hashlib.md5()
+        sha256 = hashlib.sha256()
+        written = 0
+        chunks = iter(chunks)
+        with self.path.open("r+b") as archive:
+            archive.seek(offset)
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                if written + len(chunk) > size:
+                    archive.flush()
+                    return _stage_file(
+                        self.spool_dir,
+                        key,
+                        self._spilled(offset, written, chunk, chunks),
+                    )
+                archive.write(chunk)
+                md5.update(chunk)
+                sha256.update(chunk)
+                written += len(chunk)
+        return StagedObject(
+            key, written, md5.hexdigest(), sha256.hexdigest(), offset=offset
+        )
+
+    def _spilled(
+        self, offset: int, written: int, chunk: bytes, rest: Iterator
+    ) -> Iterator:
+        # Replays what already went into the reservation, then the remainder.
+        with self.path.open("rb") as archive:
+            archive.seek(offset)
+            while written > 0:
+                data = archive.read(min(written, _HASH_CHUNK_SIZE))
+                if not data:
+                    break
+                written -= len(data)
+                yield data
+        yield chunk
+        yield from rest
+
+    def commit(self, staged: StagedObject) -> StoredObject:
+        offset = staged.offset
+        if offset is None:
+            try:
+                offset = self._reserve(staged.size)
+                with self.path.open("r+b") as archive:
+                    _append_file(archive, offset, staged.temp_path, staged.size)
+            finally:
+                self.discard(staged)
+        entry = {
+            "key": staged.key,
+            "offset": offset,
+            "size": staged.size,
+            "etag": staged.etag,
+            "sha256": staged.sha256,
+            "modified": time.time(),
+        }
+        with self._lock:
+            self._append_index(entry)
+        return self._to_object(entry)
+
+    def _view(self, end: int) -> memoryview:
+        # Remap when the archive has grown past the current mapping. Old maps
+        # are left to the garbage collector because callers may hold views.
+        if self._mmap is None or len(self._mmap) < end:
+            with self.path.open("rb") as stream:
+                self._mmap = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._mmap)
+
+    def read(self, key: str) -> memoryview:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                raise KeyError(key)
+            start, end = entry["offset"], entry["offset"] + entry["size"]
+            if start == end:
+                return memoryview(b"")
+            return self._view(end)[start:end]
+
+    def stat(self, key: str) -> Optional[StoredObject]:
+        with self._lock:
+            entry = self._entries.get(key)
+        return self._to_object(entry) if entry else None
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._append_index({"key": key, "deleted": True})
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries)
+
+    @staticmethod
+    def _to_object(entry: Dict) -> StoredObject:
+        return StoredObject(
+            entry["key"],
+            entry["size"],
+            entry["modified"],
+            entry["etag"],
+            entry.get("sha256"),
+        )
+
+
+class ObjectStoreStorage(Storage):
+    """Local stand-in for an S3-compatible bucket.
+
+    Objects live under ``root/bucket`` with flat keys; metadata (ETag, SHA-256,
+    size, last modified) is kept in a sidecar under ``root/bucket/.meta``.
+    Writes become visible atomically, like an S3 ``PUT``.
+    """
+
+    def __init__(self, root: Path, bucket: str = "pipeline") -> None:
+        self.bucket_dir = root / bucket
+        self._objects = LocalStorage(self.bucket_dir / "objects")
+        self._meta_dir = self.bucket_dir / ".meta"
+
+    def _meta_path(self, key: str) -> Path:
+        return self._meta_dir / f"{key.lstrip('/')}.json"
+
+    def stage(
+        self, key: str, chunks: Chunks, size: Optional[int] = None
+    ) -> StagedObject:
+        return self._objects.stage(key, chunks, size)
+
+    def commit(self, staged: StagedObject) -> StoredObject:
+        stored = self._objects.commit(staged)
+        meta_path = self._meta_path(stored.key)
+        meta_path.parent.mkdir(parents=True, exist_ok=True)
+        meta = {
+            "etag": stored.etag,
+            "sha256": stored.sha256,
+            "size": stored.size,
+            "modified": stored.modified,
+        }
+        meta_path.write_text(json.dumps(meta), encoding="utf-8")
+        return stored
+
+    def read(self, key: str) -> bytes:
+        try:
+            return self._objects.read(key)
+        except FileNotFoundError as exc:
+            raise KeyError(key) from exc
+
+    def source(self, key: str) -> Path:
+        return self._objects.source(key)
+
+    def stat(self, key: str) -> Optional[StoredObject]:
+        try:
+            meta = json.loads(self._meta_path(key).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        return StoredObject(
+            key, meta["size"], meta["modified"], meta["etag"], meta.get("sha256")
+        )
+
+    def delete(self, key: str) -> None:
+        self._objects.delete(key)
+        self._meta_path(key).unlink(missing_ok=True)
+
+    def put_object(self, Key: str, Body: Union[bytes, Chunks]) -> Dict:  # noqa: N803
+        chunks = [Body] if isinstance(Body, (bytes, bytearray, memoryview)) else Body
+        return {"ETag": f'"{self.write(Key, chunks).etag}"'}
+
+    def head_object(self, Key: str) -> Dict:  # noqa: N803
+        stored = self.stat(Key)
+        if stored is None:
+            raise KeyError(Key)
+        return {
+            "ContentLength": stored.size,
+            "ETag": f'"{stored.etag}"',
+            "LastModified": stored.modified,
+        }
+
+    def get_object(self, Key: str) -> Dict:  # noqa: N803
+        head = self.head_object(Key)
+        head["Body"] = self._objects.locate(Key).open("rb")
+        return head
+
+    def delete_object(self, Key: str) -> Dict:  # noqa: N803
+        self.delete(Key)
+        return {}
+
+
+DEFAULT_STORAGE = LocalStorage()
@@ -17,3 +17,22 @@ def test_process_batch(monkeypatch, tmp_path):
     processed = background_removal.process_batch([image_path], output_dir)
     assert len(processed) == 1
     assert processed[0].exists()
+
+
+def test_process_batch_skips_up_to_date_outputs(monkeypatch, tmp_path):
+    calls = []
+
+    def fake_remove(data):
+        calls.append(data)
+        return data
+
+    monkeypatch.setattr(background_removal, "remove", fake_remove)
+
+    image_path = tmp_path / "img.png"
+    image_path.write_bytes(b"dummy")
+    output_dir = tmp_path / "output"
+
+    background_removal.process_batch([image_path], output_dir)
+    processed = background_removal.process_batch([image_path], output_dir)
+    assert len(processed) == 1
+    assert calls == [b"dummy"]
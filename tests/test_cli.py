@@ -1,10 +1,11 @@
 import json
+import threading
 
 from src import cli
 
 
 def test_cli_main(monkeypatch, tmp_path, capsys):
-    def fake_run_pipeline(raw_text, output_dir):
+    def fake_run_pipeline(raw_text, output_dir, profile=False, storage=None):
         output_path = tmp_path / "123" / "processed"
         output_path.mkdir(parents=True, exist_ok=True)
         path = output_path / "img1.png"
@@ -25,3 +26,39 @@ def test_cli_main(monkeypatch, tmp_path, capsys):
     payload = json.loads(captured.out)
     assert payload["product_id"] == "123"
     assert len(payload["processed_images"]) == 1
+
+
+def test_cli_batch(monkeypatch, tmp_path, capsys):
+    def fake_run_pipeline(raw_text, output_dir, profile=False, storage=None):
+        if raw_text == "bad":
+            raise ValueError("boom")
+        return {"product_id": raw_text, "processed_images": []}
+
+    monkeypatch.setattr(cli, "run_pipeline", fake_run_pipeline)
+    batch_file = tmp_path / "inputs.txt"
+    batch_file.write_text("111\n\nbad\n222\n", encoding="utf-8")
+
+    exit_code = cli.main(["--batch", str(batch_file), "--output", str(tmp_path)])
+    assert exit_code == 1
+
+    payload = json.loads(capsys.readouterr().out)
+    assert [item.get("product_id") for item in payload] == ["111", None, "222"]
+    assert payload[1]["error"] == "boom"
+
+
+def test_cli_batch_uses_every_worker(monkeypatch, tmp_path, capsys):
+    barrier = threading.Barrier(2, timeout=5)
+
+    def fake_run_pipeline(raw_text, output_dir, profile=False, storage=None):
+        barrier.wait()
+        return {"product_id": raw_text, "processed_images": []}
+
+    monkeypatch.setattr(cli, "run_pipeline", fake_run_pipeline)
+    batch_file = tmp_path / "inputs.txt"
+    batch_file.write_text("111\n222\n", encoding="utf-8")
+
+    exit_code = cli.main(
+        ["--batch", str(batch_file), "--output", str(tmp_path), "--workers", "2"]
+    )
+    assert exit_code == 0
+    assert len(json.loads(capsys.readouterr().out)) == 2
@@ -0,0 +1,245 @@
+import threading
+import time
+
+import pytest
+
+from src.download_policy import (
+    AdaptiveSession,
+    CircuitBreaker,
+    CircuitOpenError,
+    DownloadPolicy,
+    LatencyTracker,
+    RetryBudget,
+    requests,
+)
+
+
+class DummyResponse:
+    def __init__(self, status_code=200, body=b"data"):
+        self.status_code = status_code
+        self.content = body
+        self.closed = threading.Event()
+
+    def close(self):
+        self.closed.set()
+
+
+class ScriptedSession:
+    """Session returning scripted ``(status, gate)`` results in call order.
+
+    A call with a ``gate`` blocks until that event is set. ``started`` and
+    ``finished`` hold one event per scripted call.
+    """
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.headers = {}
+        self.calls = 0
+        self.started = [threading.Event() for _ in self.script]
+        self.finished = [threading.Event() for _ in self.script]
+        self._lock = threading.Lock()
+
+    def get(self, url, timeout=None, **kwargs):
+        with self._lock:
+            index = min(self.calls, len(self.script) - 1)
+            self.calls += 1
+            body = str(self.calls).encode()
+        status, gate = self.script[index]
+        self.started[index].set()
+        if gate is not None:
+            assert gate.wait(5)
+        self.finished[index].set()
+        return DummyResponse(status, body=body)
+
+
+def _policy(**kwargs):
+    kwargs.setdefault("backoff_factor", 0)
+    kwargs.setdefault("hedge_default_delay", None)
+    return DownloadPolicy(**kwargs)
+
+
+def test_latency_tracker_percentile():
+    tracker = LatencyTracker()
+    for value in range(1, 101):
+        tracker.record("cdn", value / 100)
+    assert tracker.percentile("cdn", 0.95) == pytest.approx(0.95)
+    assert tracker.percentile("other", 0.95) is None
+
+
+def test_circuit_breaker_opens_and_probes():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.01)
+    breaker.record_failure("cdn")
+    assert breaker.allow("cdn")
+    breaker.record_failure("cdn")
+    assert not breaker.allow("cdn")
+    time.sleep(0.02)
+    assert breaker.allow("cdn")
+    assert not breaker.allow("cdn")
+    breaker.record_success("cdn")
+    assert not breaker.is_open("cdn")
+
+
+def test_retry_budget_caps_retries():
+    budget = RetryBudget(ratio=0.5, min_retries=1)
+    budget.record_request()
+    budget.record_request()
+    assert budget.try_acquire()
+    assert budget.try_acquire()
+    assert not budget.try_acquire()
+
+
+def test_retry_budget_does_not_bank_unlimited_credit():
+    budget = RetryBudget(ratio=0.2, min_retries=3, max_tokens=5)
+    for _ in range(10_000):
+        budget.record_request()
+    assert budget.tokens == 5
+    granted = sum(budget.try_acquire() for _ in range(100))
+    assert granted == 5
+
+
+def test_retries_server_errors():
+    session = ScriptedSession([(503, None), (200, None)])
+    adaptive = AdaptiveSession(session, _policy(), retries=2)
+    response = adaptive.get("https://cdn.example.com/a.png", timeout=1)
+    assert response.status_code == 200
+    assert session.calls == 2
+    adaptive.close()
+
+
+def test_hedged_request_returns_fastest_response():
+    release = threading.Event()
+    session = ScriptedSession([(200, release), (200, None)])
+    adaptive = AdaptiveSession(session, _policy(hedge_default_delay=0.01))
+    try:
+        response = adaptive.get("https://cdn.example.com/a.png", timeout=5)
+        assert response.content == b"2"
+    finally:
+        release.set()
+        adaptive.close()
+
+
+def test_retryable_status_does_not_win_hedge_race():
+    release_hedge = threading.Event()
+    session = ScriptedSession([(503, None), (200, release_hedge)])
+    session.script[0] = (503, session.started[1])
+    adaptive = AdaptiveSession(session, _policy(hedge_default_delay=0.01), retries=0)
+    results = []
+    caller = threading.Thread(
+        target=lambda: results.append(adaptive.get("https://cdn.example.com/a.png"))
+    )
+    caller.start()
+    try:
+        assert session.finished[0].wait(5)
+        # The 503 is back, but the healthy hedge is still pending.
+        caller.join(0.05)
+        assert caller.is_alive()
+    finally:
+        release_hedge.set()
+        caller.join(5)
+        adaptive.close()
+    assert results[0].status_code == 200
+    assert session.calls == 2
+
+
+def test_hedge_skipped_without_idle_worker():
+    release = threading.Event()
+    checked = threading.Event()
+    session = ScriptedSession([(200, release)])
+    policy = _policy(hedge_default_delay=0.01)
+    adaptive = AdaptiveSession(session, policy, max_workers=1)
+    has_idle_worker = adaptive._has_idle_worker
+
+    def observed():
+        checked.set()
+        return has_idle_worker()
+
+    adaptive._has_idle_worker = observed
+    tokens = policy.budget.tokens
+    caller = threading.Thread(
+        target=adaptive.get, args=("https://cdn.example.com/a.png",)
+    )
+    caller.start()
+    try:
+        assert checked.wait(5)
+    finally:
+        release.set()
+        caller.join(5)
+        adaptive.close()
+    assert session.calls == 1
+    assert policy.budget.tokens == pytest.approx(tokens + policy.retry_ratio)
+
+
+def test_circuit_open_short_circuits_requests():
+    policy = _policy(failure_threshold=1, reset_timeout=60)
+    session = ScriptedSession([(503, None)])
+    adaptive = AdaptiveSession(session, policy, retries=0)
+    assert adaptive.get("https://cdn.example.com/a.png").status_code == 503
+    with pytest.raises(CircuitOpenError):
+        adaptive.get("https://cdn.example.com/b.png")
+    assert session.calls == 1
+    adaptive.close()
+
+
+def test_probe_failing_locally_releases_circuit():
+    policy = _policy(failure_threshold=1, reset_timeout=0)
+    session = ScriptedSession([(503, None), (200, None)])
+    adaptive = AdaptiveSession(session, policy, retries=0)
+    assert adaptive.get("https://cdn.example.com/a.png").status_code == 503
+
+    def consume(response):
+        raise OSError("disk full")
+
+    with pytest.raises(OSError):
+        adaptive.fetch("https://cdn.example.com/a.png", consume=consume)
+    assert adaptive.get("https://cdn.example.com/a.png").status_code == 200
+    assert not policy.breaker.is_open("cdn.example.com")
+    adaptive.close()
+
+
+def test_fetch_retries_errors_while_consuming_body():
+    policy = _policy(failure_threshold=5)
+    session = ScriptedSession([(200, None)])
+    adaptive = AdaptiveSession(session, policy, retries=2)
+    consumed = []
+
+    def consume(response):
+        if response.content == b"1":
+            raise requests.RequestException("connection reset mid-body")
+        consumed.append(response.content)
+        return response.content
+
+    response, body = adaptive.fetch("https://cdn.example.com/a.png", consume=consume)
+    assert body == b"2"
+    assert consumed == [b"2"]
+    assert response.closed.is_set()
+    assert session.calls == 2
+    adaptive.close()
+
+
+def test_fetch_aborts_and_discards_losing_hedge():
+    session = ScriptedSession([(200, None), (200, None)])
+    adaptive = AdaptiveSession(session, _policy(hedge_default_delay=0.01))
+    discarded = []
+    released = threading.Event()
+    primary = []
+
+    def consume(response):
+        if response.content == b"1":
+            # Stalls mid-body until the winning hedge aborts the stream.
+            primary.append(response)
+            assert response.closed.wait(5)
+            return b"partial"
+        return response.content
+
+    def discard(value):
+        discarded.append(value)
+        released.set()
+
+    _, body = adaptive.fetch(
+        "https://cdn.example.com/a.png", consume=consume, discard=discard, timeout=5
+    )
+    assert body == b"2"
+    assert released.wait(5)
+    assert discarded == [b"partial"]
+    assert primary[0].closed.is_set()
+    adaptive.close()
@@ -1,12 +1,13 @@
 from src import image_downloader
+from src.download_policy import AdaptiveSession, DownloadPolicy
 
 
 def test_download_images(tmp_path, monkeypatch):
     calls = []
 
-    def fake_download(session, url, dest, timeout):
+    def fake_download(session, url, dest, timeout, headers=None, storage=None):
         calls.append(url)
-        dest.write_bytes(b"data")
+        return None, storage.write(dest.as_posix(), [b"data"])
 
     monkeypatch.setattr(image_downloader, "_download_single", fake_download)
     monkeypatch.setattr(image_downloader, "_validate_resolution", lambda path: True)
@@ -21,9 +22,9 @@ def test_download_images(tmp_path, monkeypatch):
 def test_download_images_low_resolution(tmp_path, monkeypatch):
     calls = []
 
-    def fake_download(session, url, dest, timeout):
+    def fake_download(session, url, dest, timeout, headers=None, storage=None):
         calls.append(url)
-        dest.write_bytes(b"data")
+        return None, storage.write(dest.as_posix(), [b"data"])
 
     state = {"count": 0}
 
@@ -40,3 +41,76 @@ def test_download_images_low_resolution(tmp_path, monkeypatch):
         "https://example.com/low.png",
         "https://example.com/low.png?ratio=1",
     ]
+
+
+class DummyResponse:
+    def __init__(self, status_code=200, content=b"data", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        return None
+
+
+class DummySession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, timeout=None, headers=None, stream=False):
+        self.requests.append(headers)
+        return self.responses.pop(0)
+
+    def close(self):
+        pass
+
+
+def test_download_images_revalidates_with_validators(tmp_path, monkeypatch):
+    session = DummySession(
+        [
+            DummyResponse(headers={"ETag": '"v1"', "Last-Modified": "Mon"}),
+            DummyResponse(status_code=304),
+        ]
+    )
+    monkeypatch.setattr(
+        image_downloader,
+        "_create_session",
+        lambda *_: AdaptiveSession(session, DownloadPolicy()),
+    )
+    monkeypatch.setattr(image_downloader, "_validate_resolution", lambda path: True)
+
+    urls = ["https://example.com/image.png"]
+    first = image_downloader.download_images(urls, tmp_path)
+    mtime = first[0].stat().st_mtime_ns
+    second = image_downloader.download_images(urls, tmp_path)
+
+    assert second == first
+    assert second[0].stat().st_mtime_ns == mtime
+    assert session.requests == [
+        None,
+        {"If-None-Match": '"v1"', "If-Modified-Since": "Mon"},
+    ]
+
+
+def test_download_images_refetches_corrupted_file(tmp_path, monkeypatch):
+    session = DummySession(
+        [
+            DummyResponse(headers={"ETag": '"v1"'}),
+            DummyResponse(content=b"data"),
+        ]
+    )
+    monkeypatch.setattr(
+        image_downloader,
+        "_create_session",
+        lambda *_: AdaptiveSession(session, DownloadPolicy()),
+    )
+    monkeypatch.setattr(image_downloader, "_validate_resolution", lambda path: True)
+
+    urls = ["https://example.com/image.png"]
+    first = image_downloader.download_images(urls, tmp_path)
+    first[0].write_bytes(b"DATA")  # same size, different content
+    image_downloader.download_images(urls, tmp_path)
+
+    assert session.requests == [None, None]
+    assert first[0].read_bytes() == b"data"
@@ -0,0 +1,90 @@
+import json
+import logging
+import os
+import time
+
+from src.log_config import (
+    SizeAndTimeRotatingFileHandler,
+    configure_logging,
+    run_context,
+)
+
+
+def _read_records(path):
+    return [json.loads(line) for line in path.read_text("utf-8").splitlines()]
+
+
+def test_queue_logging_writes_json_with_run_id(tmp_path):
+    logger = logging.getLogger("tests.log_config.json")
+    path = tmp_path / "pipeline.log"
+    listener = configure_logging(
+        logger, path, level=logging.DEBUG, debug_sample_rate=0.5
+    )
+    try:
+        with run_context("run-1"):
+            logger.info("hello %s", "world")
+            for index in range(4):
+                logger.debug("debug %d", index)
+        logger.warning("outside")
+    finally:
+        listener.stop()
+        logger.handlers.clear()
+
+    records = _read_records(path)
+    assert records[0]["message"] == "hello world"
+    assert records[0]["run_id"] == "run-1"
+    assert [r["message"] for r in records[1:-1]] == ["debug 0", "debug 2"]
+    assert records[-1]["run_id"] == "-"
+
+
+def test_size_rotation(tmp_path):
+    logger = logging.getLogger("tests.log_config.rotation")
+    path = tmp_path / "pipeline.log"
+    listener = configure_logging(logger, path, max_bytes=200, backup_count=2)
+    try:
+        for index in range(20):
+            logger.info("message number %d", index)
+    finally:
+        listener.stop()
+        logger.handlers.clear()
+
+    assert (tmp_path / "pipeline.log.1").exists()
+    assert not (tmp_path / "pipeline.log.3").exists()
+
+
+def test_exception_is_a_separate_field(tmp_path):
+    logger = logging.getLogger("tests.log_config.exception")
+    path = tmp_path / "pipeline.log"
+    listener = configure_logging(logger, path)
+    try:
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.exception("failed %s", "product")
+    finally:
+        listener.stop()
+        logger.handlers.clear()
+
+    (record,) = _read_records(path)
+    assert record["message"] == "failed product"
+    assert "Traceback" in record["exc_info"]
+    assert "ValueError: boom" in record["exc_info"]
+
+
+def test_time_rotation_uses_file_age(tmp_path):
+    path = tmp_path / "pipeline.log"
+    started = time.time() - 2 * 24 * 60 * 60
+    path.write_text(
+        json.dumps({"ts": "2000-01-01T00:00:00+00:00", "message": "old"}) + "\n",
+        encoding="utf-8",
+    )
+    os.utime(path, (started, started))
+
+    handler = SizeAndTimeRotatingFileHandler(
+        path, interval=24 * 60 * 60, maxBytes=0, backupCount=1, encoding="utf-8"
+    )
+    try:
+        record = logging.LogRecord("t", logging.INFO, __file__, 1, "new", None, None)
+        assert handler.shouldRollover(record)
+    finally:
+        handler.close()
@@ -1,4 +1,9 @@
+import json
+
+import pytest
+
 from src import pipeline
+from src.profiling import profiled
 
 
 class DummyClient:
@@ -17,13 +22,13 @@ def test_run_pipeline(monkeypatch, tmp_path):
     monkeypatch.setattr(pipeline, "extract_product_id", lambda text: "555")
     monkeypatch.setattr(pipeline, "DouyinClient", DummyClient)
 
-    def fake_download(images, dest_dir):
+    def fake_download(images, dest_dir, storage=None):
         dest_dir.mkdir(parents=True, exist_ok=True)
         path = dest_dir / "img1.png"
         path.touch()
         return [path]
 
-    def fake_process(paths, out_dir):
+    def fake_process(paths, out_dir, storage=None):
         out_dir.mkdir(parents=True, exist_ok=True)
         path = out_dir / "img1_transparent.png"
         path.touch()
@@ -37,3 +42,44 @@ def test_run_pipeline(monkeypatch, tmp_path):
     assert result["download_dir"].exists()
     assert result["processed_dir"].exists()
     assert len(result["processed_images"]) == 1
+
+
+def test_run_pipeline_profile(monkeypatch, tmp_path):
+    monkeypatch.setattr(pipeline, "extract_product_id", lambda text: "555")
+    monkeypatch.setattr(pipeline, "DouyinClient", DummyClient)
+
+    @profiled("_download_single")
+    def fake_download(images, dest_dir, storage=None):
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        return []
+
+    def fake_process(paths, out_dir, storage=None):
+        return []
+
+    monkeypatch.setattr(pipeline, "download_images", fake_download)
+    monkeypatch.setattr(pipeline, "process_batch", fake_process)
+
+    pipeline.run_pipeline("dummy", tmp_path, profile=True)
+
+    profile_dir = tmp_path / "555" / "profile"
+    report = json.loads((profile_dir / "profile.json").read_text(encoding="utf-8"))
+    assert report["stages"]["_download_single"]["calls"] == 1
+    assert report["timings"][0]["label"] == str(tmp_path / "555" / "original")
+    assert report["memory"]["peak_bytes"] is not None
+    assert (profile_dir / report["cprofile"]).exists()
+
+
+def test_run_pipeline_profile_written_on_failure(monkeypatch, tmp_path):
+    class FailingClient(DummyClient):
+        def fetch_product_detail(self, product_id: str):
+            raise ValueError("no data")
+
+    monkeypatch.setattr(pipeline, "extract_product_id", lambda text: "777")
+    monkeypatch.setattr(pipeline, "DouyinClient", FailingClient)
+
+    with pytest.raises(ValueError):
+        pipeline.run_pipeline("dummy", tmp_path, profile=True)
+
+    report_path = tmp_path / "777" / "profile" / "profile.json"
+    report = json.loads(report_path.read_text(encoding="utf-8"))
+    assert report["error"] == "ValueError('no data')"
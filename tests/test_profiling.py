@@ -0,0 +1,82 @@
+import contextvars
+import json
+import pstats
+import threading
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from src.profiling import PipelineProfiler, profiled, profiled_call
+
+
+@profiled("work")
+def _work(label):
+    return [0] * 1000
+
+
+def test_overlapping_profilers_share_tracemalloc():
+    first_entered = threading.Event()
+    second_entered = threading.Event()
+    first_exited = threading.Event()
+    profilers = {}
+    errors = []
+
+    def first():
+        try:
+            with PipelineProfiler() as profiler:
+                profilers["first"] = profiler
+                _work("first")
+                first_entered.set()
+                second_entered.wait(5)
+        except Exception as exc:  # pragma: no cover - surfaced below
+            errors.append(exc)
+        finally:
+            first_exited.set()
+
+    def second():
+        first_entered.wait(5)
+        try:
+            with PipelineProfiler() as profiler:
+                profilers["second"] = profiler
+                second_entered.set()
+                first_exited.wait(5)
+                assert tracemalloc.is_tracing()
+                _work("second")
+        except Exception as exc:  # pragma: no cover - surfaced below
+            errors.append(exc)
+
+    threads = [threading.Thread(target=first), threading.Thread(target=second)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert not tracemalloc.is_tracing()
+    for name in ("first", "second"):
+        profiler = profilers[name]
+        assert profiler.peak_memory is not None
+        assert profiler.allocations is not None
+        assert not profiler.exclusive_memory
+        assert [timing["label"] for timing in profiler.timings] == [name]
+
+
+def test_single_profiler_is_exclusive():
+    with PipelineProfiler() as profiler:
+        _work("only")
+    assert profiler.exclusive_memory
+    assert not tracemalloc.is_tracing()
+
+
+def _threaded_work():
+    return sum(range(1000))
+
+
+def test_cprofile_includes_work_submitted_to_other_threads(tmp_path):
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        with PipelineProfiler() as profiler:
+            context = contextvars.copy_context()
+            executor.submit(context.run, profiled_call, _threaded_work).result()
+    report = json.loads(profiler.write(tmp_path).read_text(encoding="utf-8"))
+    stats = pstats.Stats(str(tmp_path / report["cprofile"]))
+    functions = {name for _, _, name in stats.stats}
+    assert "_threaded_work" in functions
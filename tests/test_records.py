@@ -0,0 +1,86 @@
+import io
+from collections.abc import Mapping
+from pathlib import Path
+
+import pytest
+
+from src.records import (
+    ImageRecord,
+    PipelineResult,
+    ProductDetail,
+    read_jsonl,
+    to_columns,
+    write_jsonl,
+)
+
+
+def _result(product_id="1"):
+    return PipelineResult(
+        product_id=product_id,
+        title="测试",
+        download_dir=f"out/{product_id}/original",
+        processed_dir=f"out/{product_id}/processed",
+        images=(
+            ImageRecord(
+                1,
+                "https://example.com/a.png",
+                f"out/{product_id}/original/image_01.png",
+                f"out/{product_id}/processed/image_01_transparent.png",
+            ),
+            ImageRecord(2, "https://example.com/b.png", "original/image_02.png"),
+        ),
+    )
+
+
+def test_records_are_compact_and_frozen():
+    result = _result()
+    assert not hasattr(result, "__dict__")
+    with pytest.raises(AttributeError):
+        result.title = "changed"
+
+
+def test_legacy_mapping_access():
+    result = _result()
+    assert result["download_dir"] == Path("out/1/original")
+    assert result["processed_images"] == [
+        Path("out/1/processed/image_01_transparent.png")
+    ]
+    assert len(result["downloaded_images"]) == 2
+    assert result["product_detail"]["images"] == (
+        "https://example.com/a.png",
+        "https://example.com/b.png",
+    )
+    detail = ProductDetail("1", "t", ("u",))
+    assert detail.get("missing") is None
+
+
+def test_records_implement_mapping_protocol():
+    detail = ProductDetail("1", "t", ("u",))
+    assert isinstance(detail, Mapping)
+    assert dict(detail) == {"product_id": "1", "title": "t", "images": ("u",)}
+    assert detail == {"product_id": "1", "title": "t", "images": ("u",)}
+    assert len(detail) == 3
+    assert list(_result()) == [
+        "product_id",
+        "product_detail",
+        "download_dir",
+        "processed_dir",
+        "downloaded_images",
+        "processed_images",
+    ]
+    assert dict(_result().items())["download_dir"] == Path("out/1/original")
+    assert hash(detail) == hash(ProductDetail("1", "t", ("u",)))
+
+
+def test_jsonl_round_trip():
+    stream = io.StringIO()
+    assert write_jsonl([_result("1"), _result("2")], stream) == 2
+    stream.seek(0)
+    assert list(read_jsonl(stream)) == [_result("1"), _result("2")]
+
+
+def test_to_columns_one_row_per_image():
+    columns = to_columns([_result("1"), _result("2")])
+    assert columns["product_id"] == ["1", "1", "2", "2"]
+    assert columns["image_index"] == [1, 2, 1, 2]
+    assert columns["processed"][1] is None
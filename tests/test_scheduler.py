@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pytest
+
+from src.scheduler import (
+    PRIORITY_BULK,
+    PRIORITY_INTERACTIVE,
+    DeadlineExceededError,
+    PipelineScheduler,
+)
+
+
+class BlockingRunner:
+    """Record start order; block every job until ``release`` is set."""
+
+    def __init__(self):
+        self.started = []
+        self.release = threading.Event()
+        self.lock = threading.Lock()
+
+    def __call__(self, raw_text, output_dir):
+        with self.lock:
+            self.started.append(raw_text)
+        self.release.wait(timeout=5)
+        return raw_text
+
+
+def _wait_for(predicate):
+    deadline = time.monotonic() + 5
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_interactive_jobs_start_before_queued_bulk(tmp_path):
+    runner = BlockingRunner()
+    with PipelineScheduler(workers=1, runner=runner) as scheduler:
+        first = scheduler.submit("bulk-1", tmp_path)
+        _wait_for(lambda: runner.started == ["bulk-1"])
+        scheduler.submit("bulk-2", tmp_path)
+        scheduler.submit("interactive", tmp_path, priority=PRIORITY_INTERACTIVE)
+        runner.release.set()
+    assert first.result() == "bulk-1"
+    assert runner.started == ["bulk-1", "interactive", "bulk-2"]
+
+
+def test_bulk_quota_keeps_a_worker_free(tmp_path):
+    runner = BlockingRunner()
+    with PipelineScheduler(workers=2, runner=runner) as scheduler:
+        for index in range(3):
+            scheduler.submit(f"bulk-{index}", tmp_path)
+        _wait_for(lambda: len(runner.started) == 1)
+        scheduler.submit("interactive", tmp_path, priority=PRIORITY_INTERACTIVE)
+        _wait_for(lambda: len(runner.started) == 2)
+        assert runner.started[1] == "interactive"
+        assert scheduler.pending(PRIORITY_BULK) == 2
+        runner.release.set()
+
+
+def test_tenants_share_fairly_and_deadlines_order(tmp_path):
+    runner = BlockingRunner()
+    with PipelineScheduler(workers=1, runner=runner) as scheduler:
+        scheduler.submit("blocker", tmp_path, tenant="c")
+        _wait_for(lambda: runner.started == ["blocker"])
+        scheduler.submit("a-1", tmp_path, tenant="a", deadline=60)
+        scheduler.submit("a-2", tmp_path, tenant="a", deadline=10)
+        scheduler.submit("b-1", tmp_path, tenant="b", deadline=30)
+        runner.release.set()
+    assert runner.started == ["blocker", "a-2", "b-1", "a-1"]
+
+
+def test_backlogged_tenant_cannot_starve_later_tenant(tmp_path):
+    runner = BlockingRunner()
+    with PipelineScheduler(workers=2, runner=runner) as scheduler:
+        scheduler.submit("blocker", tmp_path, tenant="z")
+        _wait_for(lambda: runner.started == ["blocker"])
+        for index in range(6):
+            scheduler.submit(f"a-{index}", tmp_path, tenant="a")
+        scheduler.submit("b-0", tmp_path, tenant="b")
+        runner.release.set()
+    assert runner.started[:4] == ["blocker", "a-0", "b-0", "a-1"]
+
+
+def test_idle_tenants_are_forgotten(tmp_path):
+    runner = BlockingRunner()
+    runner.release.set()
+    with PipelineScheduler(workers=2, runner=runner) as scheduler:
+        futures = [
+            scheduler.submit(f"job-{index}", tmp_path, tenant=f"t-{index}")
+            for index in range(10)
+        ]
+        for future in futures:
+            future.result(timeout=5)
+        _wait_for(lambda: not any(scheduler._running.values()))
+        assert scheduler._served[PRIORITY_BULK] == {}
+
+
+def test_expired_deadline_fails_job(tmp_path):
+    runner = BlockingRunner()
+    with PipelineScheduler(workers=1, runner=runner) as scheduler:
+        scheduler.submit("blocker", tmp_path)
+        _wait_for(lambda: runner.started == ["blocker"])
+        late = scheduler.submit("late", tmp_path, deadline=0)
+        time.sleep(0.01)
+        runner.release.set()
+    with pytest.raises(DeadlineExceededError):
+        late.result()
+    assert runner.started == ["blocker"]
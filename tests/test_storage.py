@@ -0,0 +1,201 @@
+import hashlib
+import io
+import threading
+from pathlib import Path
+
+import pytest
+
+from src import background_removal, image_downloader
+from src.download_policy import AdaptiveSession, DownloadPolicy
+from src.storage import (
+    LocalStorage,
+    ObjectStoreStorage,
+    PackedArchiveStorage,
+    Storage,
+)
+
+
+def test_packed_archive_round_trip(tmp_path):
+    archive = PackedArchiveStorage(tmp_path / "batch.pack")
+    archive.write("p/original/a.png", [b"hello ", memoryview(b"world")])
+    archive.write("p/original/b.png", [b"second"])
+    archive.write("p/original/a.png", [b"updated"])
+    archive.delete("p/original/b.png")
+
+    view = archive.read("p/original/a.png")
+    assert isinstance(view, memoryview)
+    assert bytes(view) == b"updated"
+    assert not archive.exists("p/original/b.png")
+
+    reopened = PackedArchiveStorage(tmp_path / "batch.pack")
+    assert reopened.keys() == ["p/original/a.png"]
+    assert bytes(reopened.read("p/original/a.png")) == b"updated"
+    assert reopened.stat("p/original/a.png").size == len(b"updated")
+
+
+def test_packed_archive_stages_writes_outside_lock(tmp_path):
+    archive = PackedArchiveStorage(tmp_path / "batch.pack", spool_dir=tmp_path)
+    archive.write("a.png", [b"first"])
+    streaming = threading.Event()
+    release = threading.Event()
+
+    def slow_body():
+        yield b"slow "
+        streaming.set()
+        release.wait(5)
+        yield b"body"
+
+    writer = threading.Thread(target=archive.write, args=("b.png", slow_body()))
+    writer.start()
+    try:
+        assert streaming.wait(5)
+        # Reads and other writes proceed while the slow body is still streaming.
+        assert bytes(archive.read("a.png")) == b"first"
+        archive.write("c.png", [b"third"])
+    finally:
+        release.set()
+        writer.join()
+    assert bytes(archive.read("b.png")) == b"slow body"
+    assert bytes(archive.read("c.png")) == b"third"
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_packed_archive_streams_sized_bodies_into_archive(tmp_path):
+    spool = tmp_path / "spool"
+    archive = PackedArchiveStorage(tmp_path / "batch.pack", spool_dir=spool)
+    streaming = threading.Event()
+    release = threading.Event()
+
+    def slow_body():
+        yield b"slow "
+        streaming.set()
+        release.wait(5)
+        yield b"body"
+
+    writer = threading.Thread(
+        target=archive.write, args=("a.png", slow_body()), kwargs={"size": 9}
+    )
+    writer.start()
+    try:
+        assert streaming.wait(5)
+        archive.write("b.png", [b"other"], size=5)
+        assert bytes(archive.read("b.png")) == b"other"
+    finally:
+        release.set()
+        writer.join()
+    assert bytes(archive.read("a.png")) == b"slow body"
+    assert not spool.exists()
+
+
+def test_packed_archive_handles_wrong_size_hints(tmp_path):
+    archive = PackedArchiveStorage(tmp_path / "batch.pack", spool_dir=tmp_path)
+    longer = archive.write("long.png", [b"ab", b"cd", b"ef"], size=3)
+    shorter = archive.write("short.png", [b"xy"], size=10)
+    archive.write("next.png", [b"next"], size=4)
+
+    assert bytes(archive.read("long.png")) == b"abcdef"
+    assert longer.sha256 == hashlib.sha256(b"abcdef").hexdigest()
+    assert bytes(archive.read("short.png")) == b"xy"
+    assert shorter.size == 2
+    assert bytes(archive.read("next.png")) == b"next"
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_stored_objects_carry_sha256(tmp_path):
+    digest = hashlib.sha256(b"data").hexdigest()
+    backends = [
+        LocalStorage(tmp_path / "local"),
+        PackedArchiveStorage(tmp_path / "batch.pack"),
+        ObjectStoreStorage(tmp_path / "bucket"),
+    ]
+    for storage in backends:
+        assert storage.write("p/a.png", [b"da", b"ta"]).sha256 == digest
+        assert storage.checksum("p/a.png") == digest
+    assert PackedArchiveStorage(tmp_path / "batch.pack").checksum("p/a.png") == digest
+
+
+def test_packed_archive_source_reads_mapping_without_copy(tmp_path):
+    archive = PackedArchiveStorage(tmp_path / "batch.pack")
+    archive.write("a.png", [b"0123456789"])
+    source = archive.source("a.png")
+    assert isinstance(source, io.BufferedReader)
+    source.seek(4)
+    assert source.read(3) == b"456"
+    assert source.read() == b"789"
+
+
+def test_storage_interface_is_abstract():
+    with pytest.raises(TypeError):
+        Storage()
+
+
+def test_local_storage_streams_into_file(tmp_path):
+    storage = LocalStorage(tmp_path)
+    stored = storage.write("/abs/a.png", iter([b"ab", b"cd"]))
+    assert (tmp_path / "abs" / "a.png").read_bytes() == b"abcd"
+    assert stored.size == 4
+    assert not list(tmp_path.rglob("*.part"))
+
+
+def test_object_store_put_get(tmp_path):
+    store = ObjectStoreStorage(tmp_path)
+    etag = store.put_object(Key="p/a.png", Body=b"data")["ETag"]
+    head = store.head_object(Key="p/a.png")
+    assert head["ETag"] == etag
+    assert head["ContentLength"] == 4
+    with store.get_object(Key="p/a.png")["Body"] as body:
+        assert body.read() == b"data"
+    store.delete_object(Key="p/a.png")
+    assert store.stat("p/a.png") is None
+
+
+class DummyResponse:
+    status_code = 200
+    headers = {"ETag": '"v1"'}
+
+    def __init__(self, body):
+        self.body = body
+
+    def raise_for_status(self):
+        return None
+
+    def iter_content(self, chunk_size=1):
+        yield from (self.body[:2], self.body[2:])
+
+
+class DummySession:
+    def get(self, url, timeout=None, headers=None, stream=False):
+        return DummyResponse(url.encode())
+
+    def close(self):
+        pass
+
+
+def test_download_and_process_into_packed_archive(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    archive = PackedArchiveStorage(tmp_path / "product.pack")
+    monkeypatch.setattr(
+        image_downloader,
+        "_create_session",
+        lambda *_: AdaptiveSession(DummySession(), DownloadPolicy()),
+    )
+    monkeypatch.setattr(image_downloader, "_validate_resolution", lambda source: True)
+    monkeypatch.setattr(background_removal, "remove", lambda data: data[::-1])
+
+    paths = image_downloader.download_images(
+        ["https://example.com/a.png"], Path("out/1/original"), storage=archive
+    )
+    assert paths == [Path("out/1/original/image_01.png")]
+    assert bytes(archive.read("out/1/original/image_01.png")) == (
+        b"https://example.com/a.png"
+    )
+    assert archive.exists("out/1/original/.validators.json")
+    assert not (tmp_path / "out").exists()
+
+    processed = background_removal.process_batch(
+        paths, Path("out/1/processed"), storage=archive
+    )
+    assert processed == [Path("out/1/processed/image_01_transparent.png")]
+    assert bytes(archive.read(processed[0].as_posix())) == (
+        b"https://example.com/a.png"[::-1]
+    )